@@ -0,0 +1,258 @@
+# benchmark.py
+# Замеры производительности основных операций на синтетических данных.
+# Не импортирует tkinter: замеряются функции, которые выполняют фоновые
+# задания приложения (загрузка списка, поиск, расчет, отчеты, импорт).
+#
+# Примеры:
+#   python benchmark.py --sizes 1000 10000 --output bench.json
+#   python benchmark.py --sizes 1000000 --repeat 1 --keep --workdir bench_data
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from calculations import KopeckPayrollEngine, SalaryCalculator, TaxService, load_numpy
+from database import (ConnectionManager, ensure_employees_table, fetch_employee_stats,
+                      fetch_employees_page, find_employees)
+from importers import stream_import
+from migrations import migrate
+from payroll_runs import calculate_payroll_run, iter_payroll_run_lines, write_payroll_csv
+from reports import REPORT_TYPES, ReportSpool, iter_report_lines, write_report_csv
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+SEED = 20240301
+
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Соколов', 'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев']
+FIRST_NAMES = ['Иван', 'Петр', 'Алексей', 'Сергей', 'Андрей', 'Дмитрий', 'Михаил',
+               'Николай', 'Владимир', 'Павел', 'Олег', 'Юрий']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Андреевич', 'Александрович',
+                'Викторович', 'Николаевич']
+DEPARTMENTS = ['Руководство', 'IT-отдел', 'Бухгалтерия', 'HR-отдел', 'Отдел продаж',
+               'Отдел маркетинга', 'Отдел логистики', 'Производство', 'Склад', 'Юридический отдел']
+POSITIONS = ['Специалист', 'Ведущий специалист', 'Менеджер', 'Разработчик', 'Бухгалтер',
+             'Аналитик', 'Руководитель группы', 'Начальник отдела', 'Стажер', 'Инженер']
+
+# ============================================================================
+# ГЕНЕРАЦИЯ ДАННЫХ
+# ============================================================================
+
+def generate_employees(count, seed=SEED):
+    """Детерминированные сотрудники: словари с полями таблицы employees"""
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        yield {
+            'full_name': f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} "
+                         f"{rng.choice(MIDDLE_NAMES)} {number}",
+            'position': rng.choice(POSITIONS),
+            'base_salary': float(rng.randrange(30000, 300000, 500)),
+            'department': rng.choice(DEPARTMENTS),
+            'bank_account': f"40702810{number:012d}",
+            'tax_id': f"77{number:010d}",
+            'email': f"employee{number}@company.ru",
+            'phone': f"+7(900){number % 10000000:07d}",
+            'hire_date': f"20{rng.randint(10, 23)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'is_active': rng.random() > 0.05
+        }
+
+def make_database(path, count, seed=SEED):
+    """База salary_system.db с count сотрудниками"""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.cursor()
+        ensure_employees_table(cursor)
+        columns = ('full_name', 'position', 'base_salary', 'department', 'bank_account',
+                   'tax_id', 'email', 'phone', 'hire_date', 'is_active')
+        cursor.executemany(
+            f"INSERT INTO employees ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (tuple(emp[col] for col in columns) for emp in generate_employees(count, seed))
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+def make_import_files(directory, count, seed=SEED + 1):
+    """Файлы выгрузки 1С (CSV и JSON) с count сотрудниками, возвращает пути"""
+    csv_path = os.path.join(directory, f"import_{count}.csv")
+    json_path = os.path.join(directory, f"import_{count}.json")
+    
+    with open(csv_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(['ФИО', 'Должность', 'Отдел', 'Оклад', 'ИНН', 'БанковскийСчет'])
+        for emp in generate_employees(count, seed):
+            writer.writerow([emp['full_name'], emp['position'], emp['department'],
+                             emp['base_salary'], emp['tax_id'], emp['bank_account']])
+    
+    keys = ('full_name', 'position', 'base_salary', 'department', 'tax_id', 'bank_account')
+    with open(json_path, 'w', encoding='utf-8') as file:
+        file.write('{"source": "1C", "employees": [\n')
+        for number, emp in enumerate(generate_employees(count, seed)):
+            if number:
+                file.write(',\n')
+            json.dump({key: emp[key] for key in keys}, file, ensure_ascii=False)
+        file.write('\n]}\n')
+    
+    return csv_path, json_path
+
+# ============================================================================
+# ЗАМЕРЫ
+# ============================================================================
+
+def measure(func, repeat, setup=None):
+    """Время выполнения func (с): лучшее и среднее из repeat запусков.
+    
+    setup() вызывается перед каждым запуском и в замер не входит.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return {'best': min(times), 'mean': sum(times) / len(times), 'runs': len(times)}
+
+def benchmark_size(workdir, count, repeat):
+    """Замеры всех операций для базы из count сотрудников"""
+    results = {}
+    db_path = os.path.join(workdir, f"salary_{count}.db")
+    
+    started = time.perf_counter()
+    make_database(db_path, count)
+    csv_path, json_path = make_import_files(workdir, count)
+    results['generate_data'] = {'best': time.perf_counter() - started, 'runs': 1}
+    
+    db = ConnectionManager(db_path, pool_size=1)
+    engine = KopeckPayrollEngine(SalaryCalculator(), TaxService())
+    try:
+        def prepare_database():
+            # Миграции базы без схемы версии, как при первом запуске приложения
+            with db.cursor() as cursor:
+                migrate(cursor)
+        results['prepare_database'] = measure(prepare_database, 1)
+        
+        def load_employees():
+            # Статистика и первая страница, как при открытии вкладки
+            with db.cursor() as cursor:
+                fetch_employee_stats(cursor)
+                fetch_employees_page(cursor, 0, 200)
+        results['load_employees'] = measure(load_employees, repeat)
+        
+        def scroll_employees():
+            # Пролистывание всего списка страницами
+            with db.cursor() as cursor:
+                page = fetch_employees_page(cursor, 0, 200)
+                while page:
+                    page = fetch_employees_page(cursor, page[-1][0], 200)
+        results['scroll_employees'] = measure(scroll_employees, 1)
+        
+        for name, use_index in (('search_employees', True), ('search_employees_like', False)):
+            def search(use_index=use_index):
+                with db.cursor() as cursor:
+                    for query in ('Иванов', 'Петр Серг', 'IT', '7700000', 'employee12'):
+                        find_employees(cursor, query, 500, use_index)
+            results[name] = measure(search, repeat)
+        
+        def calculate_payroll(period):
+            with db.cursor() as cursor:
+                calculate_payroll_run(cursor, engine, period, 20, 22, 'B', 5)
+        results['calculate_all_payroll'] = measure(lambda: calculate_payroll('bench-full'), 1)
+        results['calculate_all_payroll_unchanged'] = measure(lambda: calculate_payroll('bench-full'),
+                                                             repeat)
+        
+        def export_payroll():
+            with db.cursor() as cursor:
+                cursor.execute("SELECT id FROM payroll_runs WHERE period = 'bench-full'")
+                run_id = cursor.fetchone()[0]
+                write_payroll_csv(io.StringIO(), iter_payroll_run_lines(cursor, run_id))
+        results['export_payroll_csv'] = measure(export_payroll, repeat)
+        
+        for report_type in REPORT_TYPES:
+            def generate_report(report_type=report_type):
+                with db.cursor() as cursor:
+                    ReportSpool().write(iter_report_lines(cursor, report_type)).close()
+            results[f'generate_report.{report_type}'] = measure(generate_report, repeat)
+            
+            def export_report(report_type=report_type):
+                with db.cursor() as cursor:
+                    write_report_csv(cursor, report_type, io.StringIO())
+            results[f'export_report_csv.{report_type}'] = measure(export_report, repeat)
+    finally:
+        db.close_all()
+    
+    def copy_database():
+        # Импорт идет в копию базы, уже содержащей count сотрудников
+        shutil.copyfile(db_path, db_path + '.import')
+    
+    for name, path in (('import_from_1c.csv', csv_path), ('import_from_1c.json', json_path)):
+        def import_file(path=path):
+            # Обновление существующих и вставка новых сотрудников
+            import_db = ConnectionManager(db_path + '.import', pool_size=1)
+            try:
+                stream_import(import_db, path)
+            finally:
+                import_db.close_all()
+        results[name] = measure(import_file, 1, setup=copy_database)
+    
+    return results
+
+def run(sizes, repeat, workdir):
+    """Замеры для всех размеров, возвращает словарь для JSON"""
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': getattr(load_numpy(), '__version__', None),
+        'repeat': repeat,
+        'seed': SEED,
+        'results': {}
+    }
+    for count in sizes:
+        print(f"Сотрудников: {count:,}...", file=sys.stderr)
+        report['results'][str(count)] = benchmark_size(workdir, count, repeat)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности на синтетических данных")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="числа сотрудников (по умолчанию 1000 10000 100000 1000000)")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов каждого замера")
+    parser.add_argument('--workdir', help="каталог для сгенерированных данных (по умолчанию временный)")
+    parser.add_argument('--keep', action='store_true', help="не удалять сгенерированные данные")
+    parser.add_argument('--output', help="JSON-файл результатов (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Точка входа замеров"""
+    args = parse_args(argv)
+    
+    workdir = args.workdir or tempfile.mkdtemp(prefix='salary_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        report = run(args.sizes, args.repeat, workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
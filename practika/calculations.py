@@ -0,0 +1,453 @@
+# calculations.py
+# Классы расчета заработной платы. Модуль не зависит от tkinter и
+# используется как настольным приложением, так и консольным запуском.
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from functools import total_ordering
+from types import SimpleNamespace
+
+_numpy = False  # еще не импортирован
+
+def load_numpy():
+    """Модуль numpy или None, если он не установлен.
+    
+    Импорт NumPy занимает десятки миллисекунд, поэтому выполняется при
+    первом пакетном расчете, а не при запуске приложения. Без NumPy
+    пакетный расчет выполняется построчно.
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+# ============================================================================
+# ДЕНЕЖНЫЕ СУММЫ
+# ============================================================================
+
+def div_round(numerator, denominator):
+    """Целочисленное деление с округлением половины вверх (для сумм >= 0).
+    
+    Работает и с числами, и с целочисленными массивами NumPy. Делитель
+    должен быть положительным: массив NumPy при делении на 0 молча дает 0.
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+def format_kopecks(kopecks):
+    """Сумма в копейках строкой "1234.56" (без разделителя разрядов)"""
+    sign = '-' if kopecks < 0 else ''
+    rubles, rest = divmod(abs(kopecks), 100)
+    return f"{sign}{rubles}.{rest:02d}"
+
+@total_ordering
+class Money:
+    """Денежная сумма в копейках (целое число).
+    
+    Форматируется как число с двумя знаками после запятой, например
+    f"{Money(123456):,.2f}" -> "1,234.56", без промежуточного float.
+    """
+    __slots__ = ('kopecks',)
+    
+    def __init__(self, kopecks=0):
+        self.kopecks = int(kopecks)
+    
+    @classmethod
+    def from_rubles(cls, amount):
+        """Сумма в рублях (float, str, Decimal), округление до копейки вверх от половины"""
+        value = Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return cls(value * 100)
+    
+    def to_decimal(self):
+        return Decimal(self.kopecks).scaleb(-2)
+    
+    def __add__(self, other):
+        return Money(self.kopecks + Money._kopecks(other))
+    
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        return Money(self.kopecks - Money._kopecks(other))
+    
+    def __neg__(self):
+        return Money(-self.kopecks)
+    
+    def __eq__(self, other):
+        # Сравнение с 0 - как в __lt__, чтобы Money(0) <= 0 было истинно
+        if isinstance(other, Money) or other == 0:
+            return self.kopecks == Money._kopecks(other)
+        return NotImplemented
+    
+    def __lt__(self, other):
+        return self.kopecks < Money._kopecks(other)
+    
+    def __hash__(self):
+        return hash(self.kopecks)
+    
+    def __int__(self):
+        return self.kopecks
+    
+    def __str__(self):
+        return format(self, '.2f')
+    
+    def __repr__(self):
+        return f"Money({self.kopecks})"
+    
+    def __format__(self, spec):
+        return format(self.to_decimal(), spec or '.2f')
+    
+    @staticmethod
+    def _kopecks(other):
+        if isinstance(other, Money):
+            return other.kopecks
+        if other == 0:  # для sum()
+            return 0
+        raise TypeError("Складывать можно только суммы Money")
+
+def rubles_to_kopecks(amounts):
+    """Столбец сумм в рублях - массив NumPy целых копеек по правилу Money.from_rubles.
+    
+    Округление выполняется векторно; только значения, у которых доля
+    копейки в пределах ошибки float от половины (0.285 * 100 дает
+    28.499999999999996), округляются через Decimal. Поэтому результат не
+    зависит от того, установлен ли NumPy.
+    """
+    np = load_numpy()
+    values = np.asarray(amounts, dtype=np.float64)
+    scaled = values * 100
+    kopecks = np.floor(scaled + 0.5)
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-9 * np.maximum(np.abs(scaled), 1)
+    for index in np.flatnonzero(near_half):
+        kopecks[index] = Money.from_rubles(float(values[index])).kopecks
+    return kopecks.astype(np.int64)
+
+# ============================================================================
+# КЛАССЫ ДЛЯ РАСЧЕТОВ
+# ============================================================================
+
+class Employee:
+    __slots__ = ('id', 'full_name', 'position', 'base_salary', 'bank_account', 'tax_id',
+                 'hire_date', 'department', 'email', 'phone', 'is_active')
+    
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id')
+        self.full_name = kwargs.get('full_name', '')
+        self.position = kwargs.get('position', '')
+        self.base_salary = float(kwargs.get('base_salary', 0))
+        self.bank_account = kwargs.get('bank_account', '')
+        self.tax_id = kwargs.get('tax_id', '')
+        self.hire_date = kwargs.get('hire_date', '')
+        self.department = kwargs.get('department', '')
+        self.email = kwargs.get('email', '')
+        self.phone = kwargs.get('phone', '')
+        self.is_active = kwargs.get('is_active', True)
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class EmployeeTable:
+    """Список сотрудников по столбцам, без объекта на каждую строку.
+    
+    Числовые столбцы хранятся в типизированных массивах array (id,
+    base_salary, is_active, row_version), строки отдела и должности интернируются -
+    повторяющиеся значения занимают память один раз. Остальные текстовые
+    столбцы - обычные списки. Объект Employee создается только по запросу
+    через row(i).
+    """
+    NUMERIC = {'id': 'q', 'base_salary': 'd', 'is_active': 'b', 'row_version': 'q'}
+    INTERNED = ('position', 'department')
+    
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.columns = {}
+        for name in self.names:
+            self.columns[name] = array(self.NUMERIC[name]) if name in self.NUMERIC else []
+    
+    @classmethod
+    def from_cursor(cls, cursor, batch_size=5000):
+        """Загрузка результата выполненного запроса (столбцы - по cursor.description)"""
+        table = cls([column[0] for column in cursor.description])
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return table
+            table.extend(rows)
+    
+    def extend(self, rows):
+        """Добавление строк (кортежей в порядке names)"""
+        for name, values in zip(self.names, zip(*rows)):
+            if name in self.INTERNED:
+                values = [sys.intern(value) if value else '' for value in values]
+            elif name == 'is_active':
+                values = [bool(value) for value in values]
+            self.columns[name].extend(values)
+    
+    def __len__(self):
+        return len(self.columns[self.names[0]]) if self.names else 0
+    
+    def __getitem__(self, name):
+        return self.columns[name]
+    
+    def salaries(self):
+        """Столбец окладов для PayrollBatchEngine (без копирования при наличии NumPy)"""
+        salaries = self.columns['base_salary']
+        np = load_numpy()
+        if np is None or not salaries:
+            return salaries
+        return np.frombuffer(salaries, dtype=np.float64)
+    
+    def iter_rows(self, *names):
+        """Кортежи значений указанных столбцов (по умолчанию всех)"""
+        return zip(*(self.columns[name] for name in names or self.names))
+    
+    def row(self, index):
+        """Сотрудник с номером index"""
+        return Employee(**{name: self.columns[name][index] for name in self.names})
+
+class SalaryCalculator:
+    BONUS_RATES = {'A': 0.3, 'B': 0.15, 'C': 0.05, 'D': 0.0}
+    HOURS_PER_MONTH = 176  # рабочих часов в месяце
+    
+    def __init__(self, tax_rate=0.13, overtime_rate=1.5):
+        self.tax_rate = tax_rate
+        self.overtime_rate = overtime_rate
+    
+    def calculate_base_salary(self, employee, worked_days, total_days):
+        daily_salary = employee.base_salary / total_days
+        return daily_salary * worked_days
+    
+    def calculate_hourly_rate(self, employee):
+        return employee.base_salary / self.HOURS_PER_MONTH
+    
+    def calculate_overtime(self, overtime_hours, hourly_rate):
+        return overtime_hours * hourly_rate * self.overtime_rate
+    
+    def calculate_bonus(self, employee, kpi_score):
+        return employee.base_salary * self.BONUS_RATES.get(kpi_score, 0)
+    
+    def calculate_total_income(self, base_salary, bonus, overtime_pay, sick_pay=0, vacation_pay=0):
+        return base_salary + bonus + overtime_pay + sick_pay + vacation_pay
+
+class TaxService:
+    def __init__(self, ndfl_rate=0.13):
+        self.ndfl_rate = ndfl_rate
+    
+    def calculate_ndfl(self, total_income):
+        return total_income * self.ndfl_rate
+    
+    def calculate_net_salary(self, total_income, tax_amount):
+        return total_income - tax_amount
+
+def check_working_days(total_days):
+    """Проверка числа рабочих дней в периоде перед расчетом"""
+    if total_days <= 0:
+        raise ValueError("Число рабочих дней должно быть больше нуля")
+
+class PayrollBatchEngine:
+    """Пакетный расчет зарплаты для всего списка сотрудников.
+    
+    Формулы не дублируются: методы SalaryCalculator и TaxService применяются
+    сразу к столбцу окладов (массиву NumPy), поэтому расчет всех сотрудников
+    занимает несколько векторных операций вместо цикла по строкам.
+    """
+    COLUMNS = ('base_salary', 'bonus', 'overtime_pay', 'total_income', 'tax_amount', 'net_salary')
+    DTYPE = 'float64'  # тип столбцов результата
+    
+    def __init__(self, calculator, tax_service):
+        self.calculator = calculator
+        self.tax_service = tax_service
+    
+    def rates(self, kpi_score):
+        """Ставки, от которых зависит результат расчета (для ключа кэша)"""
+        return (self.calculator.BONUS_RATES.get(kpi_score, 0), self.calculator.overtime_rate,
+                self.calculator.HOURS_PER_MONTH, self.tax_service.ndfl_rate)
+    
+    def calculate(self, base_salaries, worked_days, total_days, kpi_score, overtime_hours):
+        """Расчет по столбцу окладов, возвращает словарь столбцов COLUMNS"""
+        check_working_days(total_days)
+        np = load_numpy()
+        if np is None:
+            return self._calculate_rows(base_salaries, worked_days, total_days,
+                                        kpi_score, overtime_hours)
+        
+        roster = SimpleNamespace(base_salary=np.asarray(base_salaries, dtype=np.float64))
+        return self._calculate(roster, worked_days, total_days, kpi_score, overtime_hours)
+    
+    def _calculate(self, employee, worked_days, total_days, kpi_score, overtime_hours):
+        base_salary = self.calculator.calculate_base_salary(employee, worked_days, total_days)
+        bonus = self.calculator.calculate_bonus(employee, kpi_score)
+        hourly_rate = self.calculator.calculate_hourly_rate(employee)
+        overtime_pay = self.calculator.calculate_overtime(overtime_hours, hourly_rate)
+        total_income = self.calculator.calculate_total_income(base_salary, bonus, overtime_pay)
+        tax_amount = self.tax_service.calculate_ndfl(total_income)
+        net_salary = self.tax_service.calculate_net_salary(total_income, tax_amount)
+        return {
+            'base_salary': base_salary,
+            'bonus': bonus,
+            'overtime_pay': overtime_pay,
+            'total_income': total_income,
+            'tax_amount': tax_amount,
+            'net_salary': net_salary
+        }
+    
+    def _calculate_rows(self, base_salaries, worked_days, total_days, kpi_score, overtime_hours):
+        """Построчный расчет, если NumPy не установлен"""
+        result = {col: [] for col in self.COLUMNS}
+        employee = Employee()  # один объект на весь расчет
+        for salary in base_salaries:
+            employee.base_salary = float(salary)
+            row = self._calculate(employee, worked_days, total_days, kpi_score, overtime_hours)
+            for col in self.COLUMNS:
+                result[col].append(row[col])
+        return result
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Столбцы COLUMNS из строк с суммами в том же порядке (например, из базы)"""
+        columns = list(zip(*rows)) or [()] * len(cls.COLUMNS)
+        np = load_numpy()
+        if np is None:
+            return {col: list(values) for col, values in zip(cls.COLUMNS, columns)}
+        return {col: np.array(values, dtype=cls.DTYPE) for col, values in zip(cls.COLUMNS, columns)}
+    
+    @classmethod
+    def iter_rows(cls, result):
+        """Строки сумм в порядке COLUMNS из столбцов результата (числа Python)"""
+        columns = [result[col] for col in cls.COLUMNS]
+        return zip(*(col.tolist() if hasattr(col, 'tolist') else col for col in columns))
+    
+    @staticmethod
+    def totals(result):
+        """Итоги: начислено, НДФЛ, к выплате"""
+        columns = ('total_income', 'tax_amount', 'net_salary')
+        np = load_numpy()
+        if np is None:
+            return tuple(float(sum(result[col])) for col in columns)
+        return tuple(float(result[col].sum()) for col in columns)
+    
+    @staticmethod
+    def format_amount(amount):
+        """Сумма для отображения"""
+        return f"{amount:,.2f}"
+
+class KopeckPayrollEngine(PayrollBatchEngine):
+    """Пакетный расчет в целых копейках (столбцы int64).
+    
+    Ставки берутся из SalaryCalculator и TaxService и переводятся в целые
+    доли, дальше расчет идет без float. Правила округления:
+    - оклад переводится в копейки по десятичной записи суммы, половина -
+      вверх (Money.from_rubles, с NumPy - rubles_to_kopecks);
+    - оплата по дням, премия и сверхурочные округляются до копейки
+      отдельно в каждой строке (половина - вверх);
+    - начислено - сумма округленных слагаемых;
+    - НДФЛ исчисляется в полных рублях: менее 50 копеек отбрасывается,
+      50 копеек и более - до рубля (НК РФ ст. 52 п. 6);
+    - к выплате - начислено минус НДФЛ.
+    Итоги складываются точно, без накопления ошибки.
+    """
+    DTYPE = 'int64'
+    
+    def calculate(self, base_salaries, worked_days, total_days, kpi_score, overtime_hours):
+        """Расчет по столбцу окладов в рублях, результат - столбцы в копейках"""
+        check_working_days(total_days)
+        np = load_numpy()
+        if np is None:
+            salaries = [Money.from_rubles(salary).kopecks for salary in base_salaries]
+            rows = [self._calculate_kopecks(salary, worked_days, total_days, kpi_score, overtime_hours)
+                    for salary in salaries]
+            return self.from_rows(rows)
+        
+        salaries = rubles_to_kopecks(base_salaries)
+        return dict(zip(self.COLUMNS, self._calculate_kopecks(
+            salaries, worked_days, total_days, kpi_score, overtime_hours)))
+    
+    def _calculate_kopecks(self, salary, worked_days, total_days, kpi_score, overtime_hours):
+        """Суммы одной строки или столбца окладов в копейках"""
+        bonus_rate = round(self.calculator.BONUS_RATES.get(kpi_score, 0) * 10000)  # б.п.
+        overtime_rate = round(self.calculator.overtime_rate * 100)  # %
+        hours = round(overtime_hours * 100)  # сотые доли часа
+        ndfl_rate = round(self.tax_service.ndfl_rate * 10000)  # б.п.
+        
+        base_salary = div_round(salary * int(worked_days), int(total_days))
+        bonus = div_round(salary * bonus_rate, 10000)
+        overtime_pay = div_round(salary * hours * overtime_rate,
+                                 self.calculator.HOURS_PER_MONTH * 100 * 100)
+        total_income = base_salary + bonus + overtime_pay
+        tax_amount = div_round(total_income * ndfl_rate, 100 * 10000) * 100
+        net_salary = total_income - tax_amount
+        return base_salary, bonus, overtime_pay, total_income, tax_amount, net_salary
+    
+    @staticmethod
+    def totals(result):
+        """Итоги в копейках: начислено, НДФЛ, к выплате"""
+        columns = ('total_income', 'tax_amount', 'net_salary')
+        np = load_numpy()
+        if np is None:
+            return tuple(Money(sum(result[col])) for col in columns)
+        return tuple(Money(result[col].sum()) for col in columns)
+    
+    @staticmethod
+    def format_amount(amount):
+        return f"{Money(amount):,.2f}"
+
+class PayrollCache:
+    """Кэш результатов расчета по сотрудникам с вытеснением давно не
+    использованных записей (LRU).
+    
+    Ключ начинается с (id сотрудника, версия строки), далее идут период,
+    параметры расчета и ставки; значение - кортеж сумм в порядке
+    PayrollBatchEngine.COLUMNS. Изменение сотрудника увеличивает версию
+    строки, поэтому прежние результаты просто перестают совпадать с ключом
+    и вытесняются. Доступ защищен блокировкой: расчет идет в фоновом
+    потоке, а сброс после импорта - в потоке интерфейса.
+    """
+    
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key):
+        """Суммы по ключу или None"""
+        with self._lock:
+            amounts = self._entries.get(key)
+            if amounts is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return amounts
+    
+    def put(self, key, amounts):
+        with self._lock:
+            self._entries[key] = amounts
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Удалить все результаты (после импорта)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Счетчики: попадания, промахи, доля попаданий, размер"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
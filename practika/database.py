@@ -0,0 +1,584 @@
+# database.py
+# Запросы к базе данных, общие для настольного приложения и консольного
+# запуска. Модуль не зависит от tkinter.
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from calculations import EmployeeTable
+from tracing import TracedCursor, span, tracing_enabled
+
+DB_PATH = "salary_system.db"
+
+def has_employees_table(cursor):
+    """Проверка существования таблицы employees"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='employees'")
+    return cursor.fetchone() is not None
+
+def ensure_employees_table(cursor):
+    """Создание таблицы employees, если она не существует"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            position TEXT NOT NULL,
+            base_salary REAL NOT NULL,
+            department TEXT,
+            bank_account TEXT,
+            tax_id TEXT,
+            email TEXT,
+            phone TEXT,
+            hire_date TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+
+# Столбцы данных сотрудника. Триггеры AFTER UPDATE, кроме версии строки,
+# срабатывают только на них: обновление row_version триггером версии не
+# должно второй раз увеличивать счетчик изменений и обновлять индекс поиска.
+EMPLOYEE_DATA_COLUMNS = ('full_name', 'position', 'base_salary', 'department', 'bank_account',
+                         'tax_id', 'email', 'phone', 'hire_date', 'is_active')
+
+def ensure_employee_versions(cursor):
+    """Версия строки сотрудника, увеличиваемая триггером при каждом изменении.
+    
+    По версии сохраненные расчеты определяют, чьи данные изменились после
+    последнего расчета. В старых базах столбец row_version добавляется.
+    Возвращает False, если таблицы employees нет.
+    """
+    if not has_employees_table(cursor):
+        return False
+    
+    if 'row_version' not in fetch_table_columns(cursor, 'employees'):
+        cursor.execute("ALTER TABLE employees ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS employees_row_version
+        AFTER UPDATE ON employees
+        WHEN new.row_version = old.row_version
+        BEGIN
+            UPDATE employees SET row_version = old.row_version + 1 WHERE id = new.id;
+        END
+    """)
+    return True
+
+def fetch_table_columns(cursor, table):
+    """Имена столбцов таблицы в порядке определения"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [column[1] for column in cursor.fetchall()]
+
+# Индексы таблицы employees: (имя, определение). Индексы с ведущим
+# is_active покрывают запросы WHERE is_active = 1 целиком, без чтения
+# таблицы: расчетная ведомость - по отделу и ФИО без сортировки,
+# налоговый отчет - по ФИО, расчет зарплаты и подсчет активных - по id,
+# чтобы строки расчета искались по порядку первичного ключа. Список
+# сотрудников берет из индекса по отделу только порядок строк: дата
+# приема, email и телефон читаются из таблицы, иначе индекс был бы
+# копией таблицы. Индексы по ИНН и ФИО нужны для сопоставления при импорте.
+EMPLOYEE_INDEXES = (
+    ('idx_employees_active_department',
+     "employees(is_active, department, full_name, position, base_salary, bank_account, tax_id)"),
+    ('idx_employees_active_name', "employees(is_active, full_name, tax_id, base_salary)"),
+    ('idx_employees_active_payroll', "employees(is_active, id, row_version, base_salary, full_name)"),
+    ('idx_employees_tax_id', "employees(tax_id)"),
+    ('idx_employees_full_name', "employees(full_name)")
+)
+
+def ensure_employee_indexes(cursor):
+    """Создание индексов EMPLOYEE_INDEXES и обновление статистики планировщика"""
+    for name, definition in EMPLOYEE_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    cursor.execute("ANALYZE employees")
+
+def fetch_active_employees(cursor):
+    """Активные сотрудники для расчета: (id, full_name, position, base_salary)"""
+    cursor.execute("SELECT id, full_name, position, base_salary FROM employees WHERE is_active = 1")
+    return cursor.fetchall()
+
+def fetch_employee_table(cursor, columns="id, full_name, position, department, base_salary, tax_id",
+                         active_only=True):
+    """Сотрудники по столбцам (EmployeeTable) для расчетов, отчетов и выгрузок"""
+    where = "WHERE is_active = 1" if active_only else ""
+    cursor.execute(f"SELECT {columns} FROM employees {where} ORDER BY id")
+    return EmployeeTable.from_cursor(cursor)
+
+EMPLOYEE_LIST_COLUMNS = "id, full_name, position, department, base_salary, is_active"
+
+def fetch_employees_page(cursor, after_id=0, limit=200):
+    """Страница списка сотрудников с id больше after_id (keyset-пагинация)"""
+    cursor.execute(f"SELECT {EMPLOYEE_LIST_COLUMNS} FROM employees WHERE id > ? ORDER BY id LIMIT ?",
+                   (after_id, limit))
+    return cursor.fetchall()
+
+def fetch_employees_page_before(cursor, before_id, limit=200):
+    """Страница списка сотрудников с id меньше before_id, по возрастанию id"""
+    cursor.execute(f"SELECT {EMPLOYEE_LIST_COLUMNS} FROM employees WHERE id < ? ORDER BY id DESC LIMIT ?",
+                   (before_id, limit))
+    return cursor.fetchall()[::-1]
+
+def ensure_employee_stats(cursor):
+    """Таблица агрегатов по отделам, поддерживаемая триггерами.
+    
+    Для каждого отдела хранятся число сотрудников, число активных и суммы
+    окладов (всех и активных). Триггеры на employees добавляют вклад новой
+    строки и вычитают вклад старой, поэтому итоги читаются без обхода
+    таблицы сотрудников. Возвращает False, если таблицы employees нет.
+    """
+    if not has_employees_table(cursor):
+        return False
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='department_stats'")
+    if cursor.fetchone():
+        return True
+    
+    cursor.execute("""
+        CREATE TABLE department_stats (
+            department TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            active INTEGER NOT NULL DEFAULT 0,
+            salary_sum REAL NOT NULL DEFAULT 0,
+            active_salary_sum REAL NOT NULL DEFAULT 0
+        )
+    """)
+    
+    add_new = """
+        INSERT INTO department_stats (department, total, active, salary_sum, active_salary_sum)
+        VALUES (COALESCE(new.department, ''), 1, new.is_active = 1, new.base_salary,
+                CASE WHEN new.is_active = 1 THEN new.base_salary ELSE 0 END)
+        ON CONFLICT(department) DO UPDATE SET
+            total = total + excluded.total,
+            active = active + excluded.active,
+            salary_sum = salary_sum + excluded.salary_sum,
+            active_salary_sum = active_salary_sum + excluded.active_salary_sum;
+    """
+    remove_old = """
+        UPDATE department_stats SET
+            total = total - 1,
+            active = active - (old.is_active = 1),
+            salary_sum = salary_sum - old.base_salary,
+            active_salary_sum = active_salary_sum
+                - CASE WHEN old.is_active = 1 THEN old.base_salary ELSE 0 END
+        WHERE department = COALESCE(old.department, '');
+        DELETE FROM department_stats
+        WHERE department = COALESCE(old.department, '') AND total <= 0;
+    """
+    cursor.execute(f"CREATE TRIGGER department_stats_insert AFTER INSERT ON employees BEGIN {add_new} END")
+    cursor.execute(f"CREATE TRIGGER department_stats_delete AFTER DELETE ON employees BEGIN {remove_old} END")
+    cursor.execute(f"""
+        CREATE TRIGGER department_stats_update
+        AFTER UPDATE OF department, is_active, base_salary ON employees
+        BEGIN {remove_old} {add_new} END
+    """)
+    
+    cursor.execute("""
+        INSERT INTO department_stats (department, total, active, salary_sum, active_salary_sum)
+        SELECT COALESCE(department, ''), COUNT(*), SUM(is_active = 1), SUM(base_salary),
+               SUM(CASE WHEN is_active = 1 THEN base_salary ELSE 0 END)
+        FROM employees
+        GROUP BY COALESCE(department, '')
+    """)
+    return True
+
+def ensure_change_counter(cursor):
+    """Счетчик изменений таблицы employees, увеличиваемый триггерами.
+    
+    PRAGMA data_version не меняется для изменений, сделанных тем же
+    соединением, а соединения берутся из пула, поэтому для проверки
+    актуальности кэшей используется собственный счетчик.
+    Возвращает False, если таблицы employees нет.
+    """
+    if not has_employees_table(cursor):
+        return False
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_changes (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_changes (name) VALUES ('employees')")
+    events = {'insert': 'INSERT', 'update': f"UPDATE OF {', '.join(EMPLOYEE_DATA_COLUMNS)}",
+              'delete': 'DELETE'}
+    for name, event in events.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS employees_changes_{name}
+            AFTER {event} ON employees
+            BEGIN
+                UPDATE data_changes SET version = version + 1 WHERE name = 'employees';
+            END
+        """)
+    return True
+
+def fetch_data_version(cursor):
+    """Текущее значение счетчика изменений employees или None, если его нет"""
+    try:
+        cursor.execute("SELECT version FROM data_changes WHERE name = 'employees'")
+    except sqlite3.OperationalError:
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def fetch_employee_stats(cursor):
+    """Статистика для дашборда: (всего, активных, сумма окладов)"""
+    try:
+        cursor.execute("""
+            SELECT COALESCE(SUM(total), 0), COALESCE(SUM(active), 0), COALESCE(SUM(salary_sum), 0)
+            FROM department_stats
+        """)
+    except sqlite3.OperationalError:
+        # Таблица агрегатов еще не создана
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(is_active = 1), 0), COALESCE(SUM(base_salary), 0)
+            FROM employees
+        """)
+    return cursor.fetchone()
+
+def fetch_department_stats(cursor):
+    """Активные сотрудники по отделам: (отдел, число, ФОТ, средний оклад)"""
+    try:
+        cursor.execute("""
+            SELECT department, active, active_salary_sum, active_salary_sum / active
+            FROM department_stats
+            WHERE active > 0
+            ORDER BY department
+        """)
+    except sqlite3.OperationalError:
+        # Таблица агрегатов еще не создана
+        cursor.execute("""
+            SELECT COALESCE(department, ''), COUNT(*), SUM(base_salary), AVG(base_salary)
+            FROM employees
+            WHERE is_active = 1
+            GROUP BY COALESCE(department, '')
+            ORDER BY 1
+        """)
+    return cursor.fetchall()
+
+DIAGNOSTIC_TABLES = ('employees', 'department_stats', 'data_changes', 'payroll_runs', 'payroll_lines')
+
+def fetch_database_info(cursor):
+    """Сведения о базе для диагностики.
+    
+    Размер файла базы и журнала WAL (байт), параметры страниц и кэша
+    страниц SQLite, число строк в существующих таблицах DIAGNOSTIC_TABLES.
+    """
+    cursor.execute("PRAGMA database_list")
+    path = next((row[2] for row in cursor.fetchall() if row[1] == 'main'), '')
+    info = {'path': path, 'file_size': 0, 'wal_size': 0}
+    for key, file_path in (('file_size', path), ('wal_size', path + '-wal')):
+        if file_path and os.path.exists(file_path):
+            info[key] = os.path.getsize(file_path)
+    
+    for pragma in ('page_size', 'page_count', 'freelist_count', 'cache_size', 'journal_mode'):
+        cursor.execute(f"PRAGMA {pragma}")
+        info[pragma] = cursor.fetchone()[0]
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+    info['rows'] = {}
+    for table in DIAGNOSTIC_TABLES:
+        if table in existing:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            info['rows'][table] = cursor.fetchone()[0]
+    return info
+
+SEARCH_COLUMNS = ('full_name', 'position', 'department', 'tax_id', 'email', 'phone')
+
+def has_search_index(cursor):
+    """Проверка существования полнотекстового индекса employees_fts"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='employees_fts'")
+    return cursor.fetchone() is not None
+
+def ensure_search_triggers(cursor):
+    """Триггеры синхронизации employees_fts с таблицей employees.
+    
+    Обновление переиндексирует строку только при изменении столбцов поиска.
+    """
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_columns = ', '.join(f"new.{col}" for col in SEARCH_COLUMNS)
+    old_columns = ', '.join(f"old.{col}" for col in SEARCH_COLUMNS)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_insert AFTER INSERT ON employees BEGIN
+            INSERT INTO employees_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_delete AFTER DELETE ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_columns});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS employees_fts_update AFTER UPDATE OF {columns} ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_columns});
+            INSERT INTO employees_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END
+    """)
+
+def ensure_employee_search_index(cursor):
+    """Полнотекстовый индекс FTS5 по сотрудникам с синхронизацией триггерами.
+    
+    Индекс хранит только токены (content=employees), префиксный поиск
+    ускоряется индексами префиксов длиной 2 и 3. Возвращает False, если
+    таблицы employees нет или SQLite собран без FTS5.
+    """
+    if not has_employees_table(cursor):
+        return False
+    
+    if has_search_index(cursor):
+        return True
+    
+    columns = ', '.join(SEARCH_COLUMNS)
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE employees_fts USING fts5(
+                {columns}, content='employees', content_rowid='id', prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite без модуля fts5
+        return False
+    
+    ensure_search_triggers(cursor)
+    cursor.execute("INSERT INTO employees_fts(employees_fts) VALUES ('rebuild')")
+    return True
+
+def find_employees(cursor, query, limit=500, use_index=True):
+    """Поиск сотрудников по префиксам слов запроса, лучшие совпадения первыми.
+    
+    Без полнотекстового индекса (use_index=False) выполняется поиск LIKE.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    
+    if use_index:
+        match = ' '.join('"' + word + '"*' for word in words)
+        cursor.execute(f"""
+            SELECT {', '.join('e.' + col for col in EMPLOYEE_LIST_COLUMNS.split(', '))}
+            FROM employees_fts
+            JOIN employees e ON e.id = employees_fts.rowid
+            WHERE employees_fts MATCH ?
+            ORDER BY employees_fts.rank
+            LIMIT ?
+        """, (match, limit))
+        return cursor.fetchall()
+    
+    conditions = ' AND '.join(
+        '(' + ' OR '.join(f"{col} LIKE ?" for col in SEARCH_COLUMNS) + ')' for _ in words
+    )
+    params = [f"%{word}%" for word in words for _ in SEARCH_COLUMNS]
+    cursor.execute(f"SELECT {EMPLOYEE_LIST_COLUMNS} FROM employees WHERE {conditions} ORDER BY id LIMIT ?",
+                   (*params, limit))
+    return cursor.fetchall()
+
+def bulk_upsert_employees(cursor, rows, update_existing=True, create_missing=True):
+    """Пакетный импорт сотрудников (словари с полями 1С).
+    
+    Строки загружаются во временную таблицу одним executemany, сотрудник
+    ищется по ИНН, а если по ИНН не найден - по ФИО (оба поля индексированы,
+    см. EMPLOYEE_INDEXES). Строка без ИНН сопоставляется с однофамильцем с
+    любым ИНН, строка с ИНН - только с однофамильцем без ИНН, которому ИНН
+    записывается. Если подходящих однофамильцев несколько, строка
+    пропускается, а не добавляется дубликатом. Обновление и вставка
+    выполняются одним INSERT ... ON CONFLICT DO UPDATE.
+    Возвращает (добавлено новых, обновлено измененных существующих, пропущено).
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS import_staging (
+            row_no INTEGER PRIMARY KEY,
+            full_name TEXT NOT NULL,
+            position TEXT NOT NULL,
+            base_salary REAL NOT NULL,
+            department TEXT,
+            bank_account TEXT,
+            tax_id TEXT,
+            employee_id INTEGER,
+            candidates INTEGER
+        )
+    """)
+    cursor.execute("DELETE FROM import_staging")
+    cursor.executemany("""
+        INSERT INTO import_staging (full_name, position, base_salary, department,
+                                    bank_account, tax_id)
+        VALUES (:full_name, :position, :base_salary, :department, :bank_account, :tax_id)
+    """, rows)
+    
+    # Повторы одного сотрудника в файле: остается последняя строка
+    cursor.execute("""
+        DELETE FROM import_staging
+        WHERE row_no NOT IN (
+            SELECT MAX(row_no) FROM import_staging
+            GROUP BY CASE WHEN tax_id <> '' THEN 'tax:' || tax_id ELSE 'name:' || full_name END
+        )
+    """)
+    
+    # Сопоставление с существующими сотрудниками: по ИНН, затем по ФИО.
+    # Однофамилец с другим непустым ИНН - другой человек
+    cursor.execute("""
+        UPDATE import_staging SET employee_id = (
+            SELECT MIN(e.id) FROM employees e WHERE e.tax_id = import_staging.tax_id
+        )
+        WHERE tax_id <> ''
+    """)
+    cursor.execute("""
+        UPDATE import_staging SET (candidates, employee_id) = (
+            SELECT COUNT(*), MIN(e.id) FROM employees e
+            WHERE e.full_name = import_staging.full_name
+              AND (COALESCE(import_staging.tax_id, '') = '' OR COALESCE(e.tax_id, '') = '')
+        )
+        WHERE employee_id IS NULL
+    """)
+    
+    # Несколько однофамильцев: неизвестно, кого обновлять
+    cursor.execute("DELETE FROM import_staging WHERE candidates > 1")
+    skipped_count = cursor.rowcount
+    
+    # Несколько строк, найденных как один сотрудник: остается последняя
+    cursor.execute("""
+        DELETE FROM import_staging
+        WHERE employee_id IS NOT NULL AND row_no NOT IN (
+            SELECT MAX(row_no) FROM import_staging
+            WHERE employee_id IS NOT NULL
+            GROUP BY employee_id
+        )
+    """)
+    
+    cursor.execute("SELECT COUNT(*) - COUNT(employee_id) FROM import_staging")
+    missing_count = cursor.fetchone()[0]
+    
+    # Найденные сотрудники конфликтуют по id и обновляются, новые вставляются.
+    # Строки без изменений не обновляются и не меняют row_version и data_changes
+    cursor.execute("""
+        INSERT INTO employees (id, full_name, position, base_salary, department,
+                               bank_account, tax_id, hire_date)
+        SELECT employee_id, full_name, position, base_salary, department,
+               bank_account, tax_id, date('now', 'localtime')
+        FROM import_staging
+        WHERE (employee_id IS NOT NULL AND :update_existing)
+           OR (employee_id IS NULL AND :create_missing)
+        ORDER BY row_no
+        ON CONFLICT(id) DO UPDATE SET
+            position = excluded.position,
+            base_salary = excluded.base_salary,
+            department = excluded.department,
+            bank_account = excluded.bank_account,
+            tax_id = COALESCE(NULLIF(excluded.tax_id, ''), tax_id)
+        WHERE position IS NOT excluded.position
+           OR base_salary IS NOT excluded.base_salary
+           OR department IS NOT excluded.department
+           OR bank_account IS NOT excluded.bank_account
+           OR excluded.tax_id <> '' AND tax_id IS NOT excluded.tax_id
+    """, {'update_existing': bool(update_existing), 'create_missing': bool(create_missing)})
+    written_count = cursor.rowcount
+    
+    cursor.execute("DROP TABLE import_staging")
+    
+    imported_count = missing_count if create_missing else 0
+    updated_count = written_count - imported_count
+    return imported_count, updated_count, skipped_count
+
+class ConnectionManager:
+    """Пул долгоживущих соединений с SQLite.
+    
+    Соединения открываются один раз, настраиваются PRAGMA (WAL, таймаут
+    ожидания блокировки, уровень synchronous, размер кэша) и переиспользуются.
+    Курсоры выдаются через контекстный менеджер: при успешном выходе
+    транзакция фиксируется, при исключении откатывается, а соединение
+    возвращается в пул. Пул рассчитан на несколько рабочих потоков.
+    Если задан on_statement, курсоры передают ему каждый выполненный
+    запрос (SqlStatement, см. TracedCursor).
+    """
+    
+    def __init__(self, db_path=DB_PATH, pool_size=4, busy_timeout=5000,
+                 journal_mode='WAL', synchronous='NORMAL', cache_size=-16000, on_statement=None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout  # мс
+        self.journal_mode = journal_mode  # для сетевых дисков можно указать 'DELETE'
+        self.synchronous = synchronous
+        self.cache_size = cache_size  # отрицательное значение - размер в КБ
+        self.on_statement = on_statement
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000,
+                               check_same_thread=False)
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        return conn
+    
+    def acquire(self):
+        """Взять соединение из пула (открывается при необходимости)"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_open = self._opened < self.pool_size
+            if can_open:
+                self._opened += 1
+        
+        if not can_open:
+            # Все соединения заняты - ждем освобождения
+            return self._idle.get()
+        
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+    
+    def release(self, conn):
+        """Вернуть соединение в пул"""
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self):
+        """Соединение из пула с фиксацией транзакции при выходе"""
+        with span('db.acquire', 'db'):
+            conn = self.acquire()
+        try:
+            yield conn
+            with span('db.commit', 'db'):
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+    
+    @contextmanager
+    def cursor(self):
+        """Курсор на соединении из пула (TracedCursor при трассировке или on_statement)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if self.on_statement is not None or tracing_enabled():
+                    yield TracedCursor(cursor, self.on_statement)
+                else:
+                    yield cursor
+            finally:
+                cursor.close()
+    
+    def close_all(self):
+        """Закрыть все свободные соединения пула"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
@@ -0,0 +1,240 @@
+# importers.py
+# Чтение файлов выгрузки из 1С и потоковый импорт в базу данных.
+# Модуль не зависит от tkinter.
+import codecs
+import csv
+import json
+import os
+import time
+
+from database import bulk_upsert_employees
+from tracing import span
+
+IMPORT_CHUNK_SIZE = 5000  # строк в одной транзакции
+JSON_READ_SIZE = 64 * 1024  # байт за одно чтение JSON
+
+def map_csv_row(row):
+    """Маппинг полей строки CSV из 1С (адаптируйте под вашу структуру 1С)"""
+    return {
+        'full_name': row.get('ФИО', ''),
+        'position': row.get('Должность', ''),
+        'base_salary': float(row.get('Оклад', 0)),
+        'department': row.get('Отдел', ''),
+        'tax_id': row.get('ИНН', ''),
+        'bank_account': row.get('БанковскийСчет', '')
+    }
+
+def map_json_item(item):
+    """Маппинг полей сотрудника из JSON-выгрузки 1С"""
+    return {
+        'full_name': item.get('full_name', ''),
+        'position': item.get('position', ''),
+        'base_salary': float(item.get('base_salary', 0)),
+        'department': item.get('department', ''),
+        'tax_id': item.get('tax_id', ''),
+        'bank_account': item.get('bank_account', '')
+    }
+
+class ImportProgress:
+    """Состояние потокового импорта"""
+    
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows = 0
+        self.imported_count = 0
+        self.updated_count = 0
+        self.skipped_count = 0
+        self.cancelled = False
+        self.started = time.perf_counter()
+    
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    @property
+    def percent(self):
+        if not self.total_bytes:
+            return 100.0
+        return min(100.0, self.bytes_read * 100.0 / self.total_bytes)
+    
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+def iter_csv_chunks(filename, progress, chunk_size=IMPORT_CHUNK_SIZE):
+    """Чтение CSV из 1С частями по chunk_size строк.
+    
+    Файл читается построчно в двоичном режиме, чтобы считать прочитанные
+    байты для процента выполнения; в памяти находится только текущая часть.
+    """
+    with open(filename, 'rb') as file:
+        def lines():
+            for raw_line in file:
+                progress.bytes_read += len(raw_line)
+                yield raw_line.decode('utf-8')
+        
+        reader = csv.DictReader(lines(), delimiter=';')
+        chunk = []
+        for row in reader:
+            chunk.append(map_csv_row(row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+class JsonStreamReader:
+    """Инкрементальное чтение JSON из файла.
+    
+    В буфере хранится только непрочитанный хвост файла, значения разбираются
+    по одному через JSONDecoder.raw_decode с дочитыванием файла по мере
+    необходимости.
+    """
+    
+    DELIMITERS = ' \t\r\n,]}'
+    
+    def __init__(self, file, progress=None, read_size=JSON_READ_SIZE):
+        self.file = file
+        self.progress = progress
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        """Дочитать следующую порцию файла, False - если файл закончился"""
+        if self.eof:
+            return False
+        data = self.file.read(self.read_size)
+        if self.progress is not None:
+            self.progress.bytes_read += len(data)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Следующий значимый символ (пробелы пропускаются) или None"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Ошибка JSON: ожидается '{char}' в позиции {self.pos}")
+        self.pos += 1
+    
+    def value(self):
+        """Разобрать следующее значение JSON целиком"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Число на границе буфера может быть прочитано не полностью
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            truncated = end == len(self.buffer) or (
+                is_number and self.buffer[end] not in self.DELIMITERS)
+            if truncated and self._fill():
+                continue
+            self.pos = end
+            return value
+    
+    def iter_array(self, key):
+        """Элементы массива по ключу верхнего уровня объекта"""
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            name = self.value()
+            self.expect(':')
+            if name == key and self.peek() == '[':
+                self.pos += 1
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.value()
+                        if self.peek() == ']':
+                            self.pos += 1
+                            break
+                        self.expect(',')
+            else:
+                self.value()
+            if self.peek() == '}':
+                return
+            self.expect(',')
+
+def iter_json_employees(filename, progress=None):
+    """Сотрудники из массива employees JSON-выгрузки, по одному"""
+    with open(filename, 'rb') as file:
+        yield from JsonStreamReader(file, progress).iter_array('employees')
+
+def preview_json_employees(filename, limit=5):
+    """Первые limit сотрудников JSON-файла и признак, что есть еще"""
+    employees = []
+    for item in iter_json_employees(filename):
+        if len(employees) == limit:
+            return employees, True
+        employees.append(item)
+    return employees, False
+
+def iter_json_chunks(filename, progress, chunk_size=IMPORT_CHUNK_SIZE):
+    """Чтение JSON из 1С частями по chunk_size сотрудников"""
+    chunk = []
+    for item in iter_json_employees(filename, progress):
+        chunk.append(map_json_item(item))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_import(db, filename, update_existing=True, create_missing=True,
+                  chunk_size=IMPORT_CHUNK_SIZE, on_progress=None, cancel_event=None):
+    """Потоковый импорт CSV или JSON из 1С.
+    
+    Каждая часть файла записывается в базу в отдельной транзакции, после
+    нее вызывается on_progress(progress). Если установлен cancel_event,
+    импорт останавливается перед следующей частью; уже записанные части
+    остаются в базе. Возвращает ImportProgress.
+    """
+    progress = ImportProgress(os.path.getsize(filename))
+    
+    with span('import.stream', 'import', file=os.path.basename(filename),
+              bytes=progress.total_bytes) as import_span:
+        iter_chunks = iter_json_chunks if filename.endswith('.json') else iter_csv_chunks
+        for chunk in iter_chunks(filename, progress, chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                progress.cancelled = True
+                break
+            
+            with span('import.chunk', 'import', rows=len(chunk)), db.cursor() as cursor:
+                imported_count, updated_count, skipped_count = bulk_upsert_employees(
+                    cursor, chunk, update_existing, create_missing
+                )
+            
+            progress.rows += len(chunk)
+            progress.imported_count += imported_count
+            progress.updated_count += updated_count
+            progress.skipped_count += skipped_count
+            if on_progress is not None:
+                on_progress(progress)
+        
+        import_span.set(rows=progress.rows, imported=progress.imported_count,
+                        updated=progress.updated_count, skipped=progress.skipped_count,
+                        cancelled=progress.cancelled)
+    
+    return progress
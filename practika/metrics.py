@@ -0,0 +1,113 @@
+# metrics.py
+# Метрики производительности внутри процесса: длительности операций
+# приложения и последние SQL-запросы для вкладки Диагностика.
+# Модуль не зависит от tkinter.
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Верхние границы корзин гистограммы, с (последняя корзина - больше 30 с)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RECENT_SAMPLES = 500  # последних замеров операции для процентилей
+SQL_HISTORY = 2000  # последних запросов для списка самых медленных
+
+class LatencyHistogram:
+    """Распределение длительностей одной операции.
+    
+    Счетчики по корзинам LATENCY_BUCKETS, число замеров, сумма и максимум
+    копятся за все время, процентили считаются по последним recent замерам.
+    """
+    
+    def __init__(self, recent=RECENT_SAMPLES):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=recent)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+    
+    def observe(self, seconds, failed=False):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if failed:
+            self.errors += 1
+    
+    def snapshot(self):
+        """Словарь для отображения: count, errors, mean, p50, p95, max, last, buckets"""
+        recent = sorted(self.recent)
+        
+        def percentile(q):
+            # Ближайший ранг по последним замерам
+            return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+        
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'max': self.max,
+            'last': self.recent[-1] if self.recent else 0.0,
+            'buckets': list(self.buckets)
+        }
+
+class MetricsRegistry:
+    """Реестр метрик приложения.
+    
+    Операции (загрузка сотрудников, поиск, расчет, отчеты, импорт)
+    записывают длительность через timer(name) или observe(name, seconds)
+    из любого потока. observe_sql подходит как on_statement для
+    ConnectionManager: запоминаются последние SQL_HISTORY запросов.
+    """
+    
+    def __init__(self, sql_history=SQL_HISTORY):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._statements = deque(maxlen=sql_history)
+        self.started = time.time()
+    
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds, failed)
+    
+    @contextmanager
+    def timer(self, name):
+        """Замер блока with; исключение учитывается как ошибка операции"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - started, failed=True)
+            raise
+        self.observe(name, time.perf_counter() - started)
+    
+    def observe_sql(self, statement):
+        # Время выборки строк дописывается в statement позже, самим курсором
+        with self._lock:
+            self._statements.append(statement)
+    
+    def snapshot(self):
+        """Снимки гистограмм по именам операций"""
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+    
+    def slowest_sql(self, limit=10):
+        """Самые долгие из последних запросов (SqlStatement) по убыванию времени"""
+        with self._lock:
+            statements = list(self._statements)
+        statements.sort(key=lambda statement: statement.duration, reverse=True)
+        return statements[:limit]
+    
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._statements.clear()
+            self.started = time.time()
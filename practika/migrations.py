@@ -0,0 +1,87 @@
+# migrations.py
+# Версионированные миграции схемы базы данных. Номер последней
+# примененной миграции хранится в PRAGMA user_version, при запуске
+# приложения выполняются только более новые. Модуль не зависит от tkinter.
+#
+# Миграции только добавляются в конец списка: уже выпущенную миграцию
+# не меняют, изменение схемы оформляется новой миграцией.
+from database import (ensure_change_counter, ensure_employee_indexes, ensure_employee_search_index,
+                      ensure_employee_stats, ensure_employee_versions, ensure_employees_table,
+                      ensure_search_triggers, has_search_index)
+from payroll_runs import ensure_payroll_tables
+from tracing import span
+
+def create_employees(cursor):
+    """Таблица employees и версии строк"""
+    ensure_employees_table(cursor)
+    ensure_employee_versions(cursor)
+
+def create_employee_aggregates(cursor):
+    """Агрегаты по отделам и счетчик изменений"""
+    ensure_employee_stats(cursor)
+    ensure_change_counter(cursor)
+
+def narrow_update_triggers(cursor):
+    """Триггеры UPDATE счетчика изменений и поиска - только по столбцам данных.
+    
+    Прежние срабатывали на любое обновление, в том числе на изменение
+    row_version триггером версии, то есть дважды на каждое изменение.
+    """
+    cursor.execute("DROP TRIGGER IF EXISTS employees_changes_update")
+    ensure_change_counter(cursor)
+    if has_search_index(cursor):
+        cursor.execute("DROP TRIGGER IF EXISTS employees_fts_update")
+        ensure_search_triggers(cursor)
+
+# (номер, описание, функция(cursor)). Функции идемпотентны: базы,
+# созданные до появления миграций (user_version = 0), обновляются
+# с первой миграции без потери данных.
+MIGRATIONS = (
+    (1, "Таблица сотрудников", create_employees),
+    (2, "Агрегаты по отделам и счетчик изменений", create_employee_aggregates),
+    (3, "Сохраненные расчеты зарплаты", ensure_payroll_tables),
+    (4, "Индексы отчетов, расчета и импорта", ensure_employee_indexes),
+    (5, "Полнотекстовый индекс поиска", ensure_employee_search_index),
+    (6, "Триггеры обновления только по столбцам данных", narrow_update_triggers)
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def fetch_schema_version(cursor):
+    """Номер последней примененной миграции"""
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def migrate(cursor):
+    """Применение миграций новее версии базы.
+    
+    Каждая миграция выполняется в своей транзакции BEGIN IMMEDIATE вместе
+    с записью номера, поэтому прерванная миграция откатывается целиком, а
+    второй экземпляр приложения дождется блокировки и не повторит уже
+    примененную. Для актуальной базы выполняется один PRAGMA.
+    Возвращает номера примененных миграций.
+    """
+    version = fetch_schema_version(cursor)
+    if version >= SCHEMA_VERSION:
+        return []
+    
+    connection = cursor.connection
+    if connection.in_transaction:
+        connection.commit()
+    
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if fetch_schema_version(cursor) < number:
+                with span('db.migration', 'db', version=number, description=description):
+                    apply(cursor)
+                cursor.execute(f"PRAGMA user_version = {number}")
+                applied.append(number)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return applied
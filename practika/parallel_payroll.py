@@ -0,0 +1,104 @@
+# parallel_payroll.py
+# Многопроцессный расчет зарплаты больших списков сотрудников.
+# Модуль не зависит от tkinter: процессы пула импортируют только его
+# и calculations.py.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from calculations import check_working_days, load_numpy
+from tracing import span
+
+PARALLEL_MIN_ROWS = 50000  # меньшие списки быстрее считать в одном процессе
+
+def _calculate_shard(input_name, output_name, count, start, stop, engine, params):
+    """Расчет части [start, stop) в процессе пула.
+    
+    Оклады читаются, а результаты пишутся напрямую в разделяемую память,
+    через очередь процессов передаются только имена блоков и границы.
+    """
+    np = load_numpy()
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    salaries = output = None
+    try:
+        salaries = np.ndarray((count,), dtype=np.float64, buffer=input_shm.buf)
+        output = np.ndarray((len(engine.COLUMNS), count), dtype=engine.DTYPE, buffer=output_shm.buf)
+        
+        result = engine.calculate(salaries[start:stop], *params)
+        for row, col in enumerate(engine.COLUMNS):
+            output[row, start:stop] = result[col]
+    finally:
+        # Массивы над буферами нужно освободить до закрытия блоков памяти
+        salaries = output = None
+        input_shm.close()
+        output_shm.close()
+
+class ParallelPayrollEngine:
+    """Пакетный расчет, распределенный по процессам.
+    
+    Список окладов делится на непрерывные диапазоны по числу процессов,
+    каждый диапазон считается переданным движком (PayrollBatchEngine или
+    KopeckPayrollEngine) теми же векторными формулами, поэтому суммы
+    совпадают с однопроцессным расчетом поэлементно. Списки короче
+    min_rows, а также расчет без NumPy или с одним процессом выполняются
+    в текущем процессе. Остальные атрибуты (COLUMNS, totals, rates, ...)
+    берутся у движка.
+    """
+    
+    def __init__(self, engine, workers=None, min_rows=PARALLEL_MIN_ROWS):
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._executor = None
+    
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+    
+    def calculate(self, base_salaries, worked_days, total_days, kpi_score, overtime_hours):
+        check_working_days(total_days)
+        count = len(base_salaries)
+        np = load_numpy()
+        if np is None or self.workers <= 1 or count < self.min_rows:
+            return self.engine.calculate(base_salaries, worked_days, total_days,
+                                         kpi_score, overtime_hours)
+        
+        if self._executor is None:
+            # spawn, а не fork: расчет запускается из фонового потока приложения
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        
+        columns = len(self.engine.COLUMNS)
+        input_shm = shared_memory.SharedMemory(create=True, size=count * 8)
+        output_shm = shared_memory.SharedMemory(create=True, size=columns * count * 8)
+        salaries = output = None
+        try:
+            salaries = np.ndarray((count,), dtype=np.float64, buffer=input_shm.buf)
+            salaries[:] = base_salaries
+            
+            bounds = np.linspace(0, count, self.workers + 1, dtype=np.int64)
+            params = (worked_days, total_days, kpi_score, overtime_hours)
+            with span('payroll.parallel', 'payroll', rows=count, workers=self.workers):
+                futures = [
+                    self._executor.submit(_calculate_shard, input_shm.name, output_shm.name, count,
+                                          int(start), int(stop), self.engine, params)
+                    for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+                ]
+                for future in futures:
+                    future.result()
+            
+            output = np.ndarray((columns, count), dtype=self.engine.DTYPE, buffer=output_shm.buf)
+            return {col: output[row].copy() for row, col in enumerate(self.engine.COLUMNS)}
+        finally:
+            salaries = output = None
+            input_shm.close()
+            input_shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+    
+    def shutdown(self):
+        """Остановить процессы пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
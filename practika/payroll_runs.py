@@ -0,0 +1,212 @@
+# payroll_runs.py
+# Сохраненные расчеты зарплаты с инкрементальным пересчетом.
+# Модуль не зависит от tkinter.
+import csv
+
+from calculations import EmployeeTable, PayrollBatchEngine, format_kopecks
+from tracing import span
+
+PAYROLL_EXPORT_HEADER = ['ID', 'ФИО', 'ИНН', 'Оклад', 'Премия', 'Сверхурочные',
+                         'Начислено', 'НДФЛ', 'К выплате']
+EXPORT_CHUNK_SIZE = 5000  # строк расчета за одно чтение и запись
+
+def ensure_payroll_tables(cursor):
+    """Таблицы расчетов (payroll_runs) и строк расчета (payroll_lines).
+    
+    Расчет определяется периодом и параметрами, строка расчета хранит
+    версию данных сотрудника, по которой она посчитана, и суммы в копейках
+    (целые числа, см. KopeckPayrollEngine). Создаются миграцией при
+    запуске (migrations.py) после столбца employees.row_version.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payroll_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period TEXT NOT NULL,
+            working_days INTEGER NOT NULL,
+            worked_days INTEGER NOT NULL,
+            kpi_score TEXT NOT NULL,
+            overtime_hours REAL NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (period, working_days, worked_days, kpi_score, overtime_hours)
+        )
+    """)
+    amounts = ',\n            '.join(f"{col} INTEGER NOT NULL" for col in PayrollBatchEngine.COLUMNS)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS payroll_lines (
+            run_id INTEGER NOT NULL REFERENCES payroll_runs(id) ON DELETE CASCADE,
+            employee_id INTEGER NOT NULL,
+            employee_version INTEGER NOT NULL,
+            full_name TEXT NOT NULL,
+            {amounts},
+            PRIMARY KEY (run_id, employee_id)
+        ) WITHOUT ROWID
+    """)
+
+def get_payroll_run(cursor, period, working_days, worked_days, kpi_score, overtime_hours):
+    """id расчета за период с указанными параметрами (создается при отсутствии)"""
+    params = (period, working_days, worked_days, kpi_score, overtime_hours)
+    cursor.execute("""
+        INSERT INTO payroll_runs (period, working_days, worked_days, kpi_score, overtime_hours)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (period, working_days, worked_days, kpi_score, overtime_hours)
+        DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+    """, params)
+    cursor.execute("""
+        SELECT id FROM payroll_runs
+        WHERE period = ? AND working_days = ? AND worked_days = ? AND kpi_score = ? AND overtime_hours = ?
+    """, params)
+    return cursor.fetchone()[0]
+
+def _select_employees(cursor, employee_ids):
+    """Условие отбора сотрудников для запросов.
+    
+    Без выборки - все активные сотрудники, иначе выбранные (через временную
+    таблицу) независимо от признака активности.
+    """
+    if employee_ids is None:
+        return "e.is_active = 1"
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS payroll_selection (id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM payroll_selection")
+    cursor.executemany("INSERT OR IGNORE INTO payroll_selection (id) VALUES (?)",
+                       [(employee_id,) for employee_id in employee_ids])
+    return "e.id IN (SELECT id FROM payroll_selection)"
+
+def calculate_payroll_run(cursor, engine, period, worked_days, total_days, kpi_score,
+                          overtime_hours, employee_ids=None, cache=None):
+    """Расчет зарплаты за период с сохранением результата.
+    
+    Пересчитываются только сотрудники без строки в этом расчете или с
+    изменившейся с момента расчета версией данных; остальные строки берутся
+    из базы. employee_ids ограничивает расчет выбранными сотрудниками (в том
+    числе неактивными), иначе считаются все активные, а строки уволенных и
+    удаленных сотрудников из расчета убираются.
+    
+    Если передан cache (PayrollCache) и выборка в нем помещается, суммы
+    сначала ищутся в кэше по (id, версия строки, период, параметры), и
+    повторный расчет с теми же данными не читает сохраненные строки.
+    Возвращает (id расчета, ФИО, столбцы сумм, число пересчитанных сотрудников).
+    """
+    with span('payroll.run', 'payroll', period=period,
+              selected=None if employee_ids is None else len(employee_ids)) as run_span:
+        run_id = get_payroll_run(cursor, period, total_days, worked_days, kpi_score, overtime_hours)
+        selection = _select_employees(cursor, employee_ids)
+        
+        if cache is not None:
+            # Выборка больше кэша вытеснила бы из него сама себя
+            if employee_ids is None:
+                cursor.execute("SELECT COUNT(*) FROM employees WHERE is_active = 1")
+                size = cursor.fetchone()[0]
+            else:
+                size = len(employee_ids)
+            if size > cache.maxsize:
+                cache = None
+        
+        # Отобранные сотрудники и версия их данных в сохраненной строке расчета;
+        # без кэша суммы сохраненной строки читаются тем же запросом
+        saved_columns = [f"saved_{col}" for col in PayrollBatchEngine.COLUMNS]
+        saved_amounts = '' if cache is not None else ''.join(
+            f", l.{col} AS saved_{col}" for col in PayrollBatchEngine.COLUMNS)
+        cursor.execute(f"""
+            SELECT e.id, e.row_version, e.full_name, e.base_salary,
+                   COALESCE(l.employee_version, 0) AS saved_version{saved_amounts}
+            FROM employees e
+            LEFT JOIN payroll_lines l ON l.run_id = ? AND l.employee_id = e.id
+            WHERE {selection}
+            ORDER BY e.id
+        """, (run_id,))
+        employees = EmployeeTable.from_cursor(cursor)
+        ids, versions = employees['id'], employees['row_version']
+        current = [version == saved for version, saved in zip(versions, employees['saved_version'])]
+        changed = [index for index, is_current in enumerate(current) if not is_current]
+        
+        params = (period, kpi_score, overtime_hours, worked_days, total_days, engine.rates(kpi_score))
+        if cache is None:
+            lines = {row[0]: row[1:] for row, is_current
+                     in zip(employees.iter_rows('id', *saved_columns), current) if is_current}
+        else:
+            lines = {}
+            for employee_id, version in zip(ids, versions):
+                amounts = cache.get((employee_id, version, *params))
+                if amounts is not None:
+                    lines[employee_id] = amounts
+            run_span.set(from_cache=len(lines))
+            
+            saved = {ids[index]: versions[index] for index, is_current in enumerate(current)
+                     if is_current and ids[index] not in lines}
+            if saved:
+                # Актуальные сохраненные строки, которых нет в кэше
+                for chunk in iter_payroll_run_lines(cursor, run_id, employee_ids):
+                    for employee_id, _, _, *amounts in chunk:
+                        if employee_id in saved:
+                            lines[employee_id] = tuple(amounts)
+                            cache.put((employee_id, saved[employee_id], *params), lines[employee_id])
+        
+        missing = [index for index in changed if ids[index] not in lines]
+        if missing:
+            with span('payroll.calculate', 'payroll', rows=len(missing)):
+                # Первый расчет - весь столбец окладов без копирования
+                salaries = employees.salaries() if len(missing) == len(employees) else \
+                    [employees['base_salary'][index] for index in missing]
+                result = engine.calculate(salaries, worked_days, total_days, kpi_score, overtime_hours)
+                for index, amounts in zip(missing, engine.iter_rows(result)):
+                    lines[ids[index]] = amounts
+                    if cache is not None:
+                        cache.put((ids[index], versions[index], *params), amounts)
+        
+        if changed:
+            names = employees['full_name']
+            cursor.executemany(f"""
+                INSERT OR REPLACE INTO payroll_lines
+                    (run_id, employee_id, employee_version, full_name, {', '.join(PayrollBatchEngine.COLUMNS)})
+                VALUES (?, ?, ?, ?, {', '.join('?' * len(PayrollBatchEngine.COLUMNS))})
+            """, [(run_id, ids[index], versions[index], names[index], *lines[ids[index]])
+                  for index in changed])
+        
+        if employee_ids is None:
+            cursor.execute("""
+                DELETE FROM payroll_lines
+                WHERE run_id = ? AND employee_id NOT IN (SELECT id FROM employees WHERE is_active = 1)
+            """, (run_id,))
+        
+        run_span.set(rows=len(employees), recalculated=len(changed))
+        return (run_id, employees['full_name'], engine.from_rows([lines[employee_id] for employee_id in ids]),
+                len(changed))
+
+def iter_payroll_run_lines(cursor, run_id, employee_ids=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки сохраненного расчета частями по chunk_size.
+    
+    Строка - (id, ФИО, ИНН, суммы в копейках в порядке COLUMNS), только
+    employee_ids, если они указаны, иначе только активные сотрудники.
+    """
+    selection = _select_employees(cursor, employee_ids)
+    cursor.execute(f"""
+        SELECT l.employee_id, l.full_name, e.tax_id,
+               {', '.join('l.' + col for col in PayrollBatchEngine.COLUMNS)}
+        FROM payroll_lines l
+        JOIN employees e ON e.id = l.employee_id
+        WHERE l.run_id = ? AND {selection}
+        ORDER BY l.employee_id
+    """, (run_id,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def write_payroll_csv(file, chunks):
+    """Выгрузка строк расчета (части iter_payroll_run_lines) в CSV для 1С.
+    
+    Суммы пишутся числами с точкой без разделителя разрядов и знака
+    валюты. Возвращает число строк.
+    """
+    with span('payroll.export_csv', 'payroll') as export_span:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(PAYROLL_EXPORT_HEADER)
+        count = 0
+        for rows in chunks:
+            writer.writerows([(employee_id, full_name, tax_id or '', *map(format_kopecks, amounts))
+                              for employee_id, full_name, tax_id, *amounts in rows])
+            count += len(rows)
+        export_span.set(rows=count)
+    return count
@@ -0,0 +1,402 @@
+# reports.py
+# Формирование отчетов по базе сотрудников. Модуль не зависит от tkinter.
+#
+# Данные каждого отчета описаны моделью (столбцы и запрос), из нее CSV
+# выгружается напрямую. Текстовый отчет - генератор строк, читающий записи
+# прямо из курсора, поэтому отчет любого размера можно записать в файл или
+# показать в предпросмотре, не собирая его целиком в памяти.
+import csv
+import os
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from database import fetch_department_stats
+from tracing import span
+
+# ============================================================================
+# МОДЕЛЬ ОТЧЕТОВ: СТОЛБЦЫ И СТРОКИ ДАННЫХ
+# ============================================================================
+
+class ReportColumn(namedtuple('ReportColumn', 'key title kind')):
+    """Столбец отчета; kind - 'text', 'int' или 'money'"""
+    
+    def to_csv(self, value):
+        """Значение для CSV: суммы с двумя знаками без разделителя разрядов"""
+        if value is None:
+            return ''
+        if self.kind == 'money':
+            return f"{value:.2f}"
+        return value
+
+class ReportModel:
+    """Отчет как таблица: определения столбцов и итератор строк из курсора"""
+    
+    def __init__(self, code, title, columns, query):
+        self.code = code
+        self.title = title
+        self.columns = columns
+        self.query = query
+    
+    def iter_rows(self, cursor):
+        """Кортежи значений в порядке columns, читаются из курсора по мере обхода"""
+        if callable(self.query):
+            return iter(self.query(cursor))
+        cursor.execute(self.query)
+        return cursor
+
+REPORT_MODELS = {model.code: model for model in [
+    ReportModel("payroll_report", "Расчетная ведомость", [
+        ReportColumn('full_name', "ФИО", 'text'),
+        ReportColumn('position', "Должность", 'text'),
+        ReportColumn('department', "Отдел", 'text'),
+        ReportColumn('base_salary', "Оклад", 'money'),
+        ReportColumn('bank_account', "Банковский счет", 'text'),
+        ReportColumn('tax_id', "ИНН", 'text')
+    ], """
+        SELECT e.full_name, e.position, e.department, e.base_salary, 
+               e.bank_account, e.tax_id
+        FROM employees e 
+        WHERE e.is_active = 1
+        ORDER BY e.department, e.full_name
+    """),
+    ReportModel("employee_list", "Список сотрудников", [
+        ReportColumn('full_name', "ФИО", 'text'),
+        ReportColumn('position', "Должность", 'text'),
+        ReportColumn('department', "Отдел", 'text'),
+        ReportColumn('base_salary', "Оклад", 'money'),
+        ReportColumn('hire_date', "Дата приема", 'text'),
+        ReportColumn('email', "Email", 'text'),
+        ReportColumn('phone', "Телефон", 'text')
+    ], """
+        SELECT e.full_name, e.position, e.department, e.base_salary, 
+               e.hire_date, e.email, e.phone
+        FROM employees e 
+        WHERE e.is_active = 1
+        ORDER BY e.department, e.full_name
+    """),
+    ReportModel("tax_report", "Налоговый отчет", [
+        ReportColumn('full_name', "ФИО", 'text'),
+        ReportColumn('tax_id', "ИНН", 'text'),
+        ReportColumn('income', "Доход", 'money'),
+        ReportColumn('ndfl', "НДФЛ", 'money')
+    ], """
+        SELECT e.full_name, e.tax_id, e.base_salary, 
+               e.base_salary * 0.13 as ndfl
+        FROM employees e 
+        WHERE e.is_active = 1
+        ORDER BY e.full_name
+    """),
+    ReportModel("department_report", "Отчет по отделам", [
+        ReportColumn('department', "Отдел", 'text'),
+        ReportColumn('employees', "Сотрудников", 'int'),
+        ReportColumn('salary_fund', "ФОТ", 'money'),
+        ReportColumn('avg_salary', "Средняя", 'money')
+    ], fetch_department_stats)
+]}
+
+# Доступные отчеты: (название, код)
+REPORTS = [(model.title, code) for code, model in REPORT_MODELS.items()]
+
+REPORT_TYPES = list(REPORT_MODELS)
+
+def write_report_csv(cursor, report_type, file):
+    """Выгрузка данных отчета в CSV (';') прямо из курсора.
+    
+    Первая строка - заголовки столбцов, далее строки данных без
+    оформления и итогов. Возвращает число строк данных.
+    """
+    model = REPORT_MODELS[report_type]
+    with span('report.export_csv', 'report', report=report_type) as export_span:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow([column.title for column in model.columns])
+        count = 0
+        for row in model.iter_rows(cursor):
+            writer.writerow([column.to_csv(value) for column, value in zip(model.columns, row)])
+            count += 1
+        export_span.set(rows=count)
+    return count
+
+# ============================================================================
+# ТЕКСТОВЫЕ ОТЧЕТЫ
+# ============================================================================
+
+# Формат даты в заголовке отчета; она входит в ключ кэша отчетов,
+# поэтому отчет из кэша не показывает устаревшую дату
+REPORT_DATE_FORMATS = {
+    "payroll_report": '%d.%m.%Y %H:%M',
+    "employee_list": '%d.%m.%Y',
+    "tax_report": '%m.%Y',
+    "department_report": '%d.%m.%Y'
+}
+
+def report_date(report_type, now):
+    """Дата формирования (для налогового отчета - период) в заголовке отчета"""
+    return now.strftime(REPORT_DATE_FORMATS[report_type])
+
+def count_active_employees(cursor):
+    cursor.execute("SELECT COUNT(*) FROM employees WHERE is_active = 1")
+    return cursor.fetchone()[0]
+
+def iter_payroll_report(cursor, now):
+    """Расчетная ведомость"""
+    employees_count = count_active_employees(cursor)
+    
+    yield "РАСЧЕТНАЯ ВЕДОМОСТЬ\n"
+    yield "=" * 50 + "\n"
+    yield f"Дата формирования: {report_date('payroll_report', now)}\n"
+    yield f"Всего сотрудников: {employees_count}\n"
+    yield "=" * 50 + "\n\n"
+    
+    total_salary = 0
+    for emp in REPORT_MODELS["payroll_report"].iter_rows(cursor):
+        yield f"ФИО: {emp[0]}\n"
+        yield f"Должность: {emp[1]}\n"
+        yield f"Отдел: {emp[2]}\n"
+        yield f"Оклад: {emp[3]:,.2f} ₽\n"
+        yield f"Банковский счет: {emp[4]}\n"
+        yield f"ИНН: {emp[5]}\n"
+        yield "-" * 30 + "\n"
+        total_salary += emp[3]
+    
+    yield f"\nОБЩИЙ ФОНД ОПЛАТЫ: {total_salary:,.2f} ₽\n"
+
+def iter_employee_list(cursor, now):
+    """Список сотрудников"""
+    employees_count = count_active_employees(cursor)
+    
+    yield "СПИСОК СОТРУДНИКОВ\n"
+    yield "=" * 50 + "\n"
+    yield f"Дата формирования: {report_date('employee_list', now)}\n"
+    yield f"Всего сотрудников: {employees_count}\n"
+    yield "=" * 50 + "\n\n"
+    
+    yield f"{'ФИО':<30} {'Должность':<20} {'Отдел':<15} {'Оклад':>10} {'Дата приема':<12}\n"
+    yield "-" * 87 + "\n"
+    
+    for emp in REPORT_MODELS["employee_list"].iter_rows(cursor):
+        yield f"{emp[0]:<30} {emp[1]:<20} {emp[2]:<15} {emp[3]:>10,.0f} ₽ {emp[4]:<12}\n"
+
+def iter_tax_report(cursor, now):
+    """Налоговый отчет"""
+    yield "НАЛОГОВЫЙ ОТЧЕТ (НДФЛ)\n"
+    yield "=" * 50 + "\n"
+    yield f"Период: {report_date('tax_report', now)}\n"
+    yield "Ставка НДФЛ: 13%\n"
+    yield "=" * 50 + "\n\n"
+    
+    yield f"{'ФИО':<30} {'ИНН':<15} {'Доход':>12} {'НДФЛ':>12}\n"
+    yield "-" * 69 + "\n"
+    
+    total_income = 0
+    total_tax = 0
+    
+    for emp in REPORT_MODELS["tax_report"].iter_rows(cursor):
+        yield f"{emp[0]:<30} {emp[1]:<15} {emp[2]:>12,.2f} ₽ {emp[3]:>12,.2f} ₽\n"
+        total_income += emp[2]
+        total_tax += emp[3]
+    
+    yield "-" * 69 + "\n"
+    yield f"{'ИТОГО:':<45} {total_income:>12,.2f} ₽ {total_tax:>12,.2f} ₽\n"
+
+def iter_department_report(cursor, now):
+    """Отчет по отделам"""
+    departments = REPORT_MODELS["department_report"].iter_rows(cursor)
+    
+    yield "ОТЧЕТ ПО ОТДЕЛАМ\n"
+    yield "=" * 50 + "\n"
+    yield f"Дата формирования: {report_date('department_report', now)}\n"
+    yield "=" * 50 + "\n\n"
+    
+    yield f"{'Отдел':<20} {'Сотр.':>6} {'ФОТ':>12} {'Средняя':>12}\n"
+    yield "-" * 50 + "\n"
+    
+    total_employees = 0
+    total_salary = 0
+    
+    for dept in departments:
+        yield f"{dept[0]:<20} {dept[1]:>6} {dept[2]:>12,.0f} ₽ {dept[3]:>12,.0f} ₽\n"
+        total_employees += dept[1]
+        total_salary += dept[2]
+    
+    yield "-" * 50 + "\n"
+    yield f"{'ИТОГО:':<20} {total_employees:>6} {total_salary:>12,.0f} ₽\n"
+
+REPORT_GENERATORS = {
+    "payroll_report": iter_payroll_report,
+    "employee_list": iter_employee_list,
+    "tax_report": iter_tax_report,
+    "department_report": iter_department_report
+}
+
+def iter_report_lines(cursor, report_type, now=None):
+    """Строки отчета указанного типа (каждая с переводом строки).
+    
+    Записи читаются из курсора по мере выдачи строк: курсор нельзя
+    использовать для других запросов, пока генератор не исчерпан.
+    now - момент формирования для заголовка (по умолчанию текущий).
+    """
+    return REPORT_GENERATORS[report_type](cursor, now or datetime.now())
+
+def build_report(cursor, report_type, now=None):
+    """Формирование текста отчета указанного типа"""
+    return ''.join(iter_report_lines(cursor, report_type, now))
+
+def write_report(lines, file):
+    """Запись строк текстового отчета в открытый файл, возвращает число строк"""
+    count = 0
+    for line in lines:
+        file.write(line)
+        count += 1
+    return count
+
+class ReportSpool:
+    """Сформированный отчет во временном файле с индексом начала строк.
+    
+    Отчет записывается в фоне методом write, а интерфейс тем временем
+    читает уже записанные строки по номерам (read_lines) через отдельный
+    дескриптор файла. В памяти хранятся только смещения строк.
+    """
+    
+    def __init__(self):
+        spool = tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False)
+        self.path = spool.name
+        self._writer = spool
+        self._reader = open(self.path, 'rb')
+        self._offsets = array('q')
+        self._size = 0
+        self.line_count = 0  # строк, доступных для чтения
+        self.finished = False
+        self.elapsed = 0.0
+    
+    def write(self, lines, on_progress=None, progress_lines=1000):
+        """Запись строк отчета; on_progress(self) - после каждых progress_lines строк.
+        
+        Возвращает self.
+        """
+        started = time.perf_counter()
+        pending = 0
+        with span('report.spool', 'report') as spool_span:
+            for piece in lines:
+                data = piece.encode('utf-8')
+                # Строки отчета заканчиваются переводом строки, части могут содержать несколько строк
+                position = 0
+                while position < len(data):
+                    self._offsets.append(self._size + position)
+                    position = data.find(b'\n', position) + 1 or len(data)
+                    pending += 1
+                self._writer.write(data)
+                self._size += len(data)
+                if pending >= progress_lines:
+                    self._publish(started)
+                    pending = 0
+                    if on_progress is not None:
+                        on_progress(self)
+            self._publish(started)
+            spool_span.set(lines=self.line_count, bytes=self._size)
+        self.finished = True
+        if on_progress is not None:
+            on_progress(self)
+        return self
+    
+    def _publish(self, started):
+        self._writer.flush()
+        self.line_count = len(self._offsets)
+        self.elapsed = time.perf_counter() - started
+    
+    def read_lines(self, start, stop):
+        """Текст строк с номерами [start, stop)"""
+        stop = min(stop, self.line_count)
+        if start >= stop:
+            return ''
+        end = self._offsets[stop] if stop < len(self._offsets) else None
+        self._reader.seek(self._offsets[start])
+        data = self._reader.read(-1 if end is None else end - self._offsets[start])
+        return data.decode('utf-8')
+    
+    def iter_lines(self):
+        """Все строки отчета по порядку (для сохранения в файл)"""
+        with open(self.path, 'rb') as file:
+            for index, line in enumerate(file):
+                if index >= self.line_count:
+                    break
+                yield line.decode('utf-8')
+    
+    def close(self):
+        self._writer.close()
+        self._reader.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class ReportCache:
+    """Сформированные отчеты (ReportSpool) по ключу (тип отчета, версия
+    данных, дата в заголовке отчета).
+    
+    Пока счетчик изменений сотрудников и дата в заголовке (report_date) не
+    изменились, повторный запрос отчета возвращает готовый результат. Хранится не более maxsize отчетов, давно
+    не запрашивавшиеся вытесняются; put возвращает вытесненные отчеты,
+    которые вызывающая сторона должна закрыть, когда они не нужны.
+    Счетчики hits/misses и суммарное время формирования - в stats().
+    """
+    
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation_time = 0.0  # с, суммарно для сформированных заново
+        self._spools = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, report_type, version, now):
+        if version is None:
+            return None
+        key = (report_type, version, report_date(report_type, now))
+        with self._lock:
+            spool = self._spools.get(key)
+            if spool is None:
+                self.misses += 1
+                return None
+            self._spools.move_to_end(key)
+            self.hits += 1
+            return spool
+    
+    def put(self, report_type, version, now, spool):
+        """Сохранить отчет, вернуть список вытесненных"""
+        if version is None:
+            return []
+        key = (report_type, version, report_date(report_type, now))
+        with self._lock:
+            self.generation_time += spool.elapsed
+            # Отчеты по устаревшей версии данных или дате больше не понадобятся
+            evicted = [self._spools.pop(cached) for cached in list(self._spools)
+                       if cached[0] == report_type and cached != key]
+            self._spools[key] = spool
+            while len(self._spools) > self.maxsize:
+                evicted.append(self._spools.popitem(last=False)[1])
+            return evicted
+    
+    def __contains__(self, spool):
+        with self._lock:
+            return any(cached is spool for cached in self._spools.values())
+    
+    def clear(self):
+        """Удалить все отчеты из кэша, вернуть их список"""
+        with self._lock:
+            spools = list(self._spools.values())
+            self._spools.clear()
+            return spools
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._spools),
+                'maxsize': self.maxsize,
+                'generation_time': self.generation_time
+            }
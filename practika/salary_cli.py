@@ -0,0 +1,111 @@
+# salary_cli.py
+# Консольный запуск расчета зарплаты и отчетов без графического интерфейса.
+# Не импортирует tkinter, поэтому подходит для сервера и cron.
+#
+# Примеры:
+#   python salary_cli.py payroll --month 2024-03 --output payroll.csv
+#   python salary_cli.py report tax_report --output tax.txt
+import argparse
+import sys
+from datetime import datetime
+from itertools import islice
+
+from calculations import SalaryCalculator, TaxService, KopeckPayrollEngine
+from database import DB_PATH, ConnectionManager, fetch_employee_table, has_employees_table
+from parallel_payroll import ParallelPayrollEngine
+from payroll_runs import EXPORT_CHUNK_SIZE, write_payroll_csv
+from reports import REPORT_TYPES, iter_report_lines, write_report, write_report_csv
+
+def open_output(path):
+    """Файл для записи результата или stdout"""
+    if path:
+        return open(path, 'w', newline='', encoding='utf-8')
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8')
+    return sys.stdout
+
+def run_payroll(cursor, args):
+    """Расчет зарплаты всех активных сотрудников с выводом в CSV"""
+    engine = ParallelPayrollEngine(KopeckPayrollEngine(SalaryCalculator(), TaxService()),
+                                   workers=args.workers)
+    
+    employees = fetch_employee_table(cursor, "id, full_name, tax_id, base_salary")
+    try:
+        result = engine.calculate(employees.salaries(), args.worked_days,
+                                  args.working_days, args.kpi, args.overtime)
+    finally:
+        engine.shutdown()
+    
+    rows = ((*employee, *amounts) for employee, amounts in
+            zip(employees.iter_rows('id', 'full_name', 'tax_id'), engine.iter_rows(result)))
+    chunks = iter(lambda: list(islice(rows, EXPORT_CHUNK_SIZE)), [])
+    
+    output = open_output(args.output)
+    try:
+        write_payroll_csv(output, chunks)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    total_income, total_tax, total_net = engine.totals(result)
+    print(f"Период: {args.month}, сотрудников: {len(employees)}", file=sys.stderr)
+    print(f"Общая сумма: {total_income:.2f}, НДФЛ: {total_tax:.2f}, "
+          f"к выплате: {total_net:.2f}", file=sys.stderr)
+
+def run_report(cursor, args):
+    """Формирование отчета с выводом в текстовом виде или в CSV"""
+    output = open_output(args.output)
+    try:
+        if args.format == 'csv':
+            write_report_csv(cursor, args.report_type, output)
+        else:
+            write_report(iter_report_lines(cursor, args.report_type), output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Система расчета заработной платы (консольный режим)")
+    parser.add_argument('--db', default=DB_PATH, help="путь к базе данных")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    payroll = commands.add_parser('payroll', help="расчет зарплаты всех активных сотрудников")
+    payroll.add_argument('--month', default=datetime.now().strftime('%Y-%m'))
+    payroll.add_argument('--working-days', type=int, default=22, help="рабочих дней")
+    payroll.add_argument('--worked-days', type=int, default=20, help="отработано дней")
+    payroll.add_argument('--kpi', choices=['A', 'B', 'C', 'D'], default='B', help="коэф. премии")
+    payroll.add_argument('--overtime', type=float, default=5, help="сверхурочные часы")
+    payroll.add_argument('--workers', type=int, default=1,
+                         help="процессов расчета (0 - по числу ядер)")
+    payroll.add_argument('--output', help="CSV-файл (по умолчанию stdout)")
+    payroll.set_defaults(handler=run_payroll)
+    
+    report = commands.add_parser('report', help="формирование отчета")
+    report.add_argument('report_type', choices=REPORT_TYPES)
+    report.add_argument('--format', choices=['txt', 'csv'], default='txt', help="формат вывода")
+    report.add_argument('--output', help="файл (по умолчанию stdout)")
+    report.set_defaults(handler=run_report)
+    
+    args = parser.parse_args(argv)
+    if args.command == 'payroll' and args.working_days <= 0:
+        parser.error("--working-days: число рабочих дней должно быть больше нуля")
+    return args
+
+def main(argv=None):
+    """Точка входа консольного режима"""
+    args = parse_args(argv)
+    
+    db = ConnectionManager(args.db, pool_size=1)
+    try:
+        with db.cursor() as cursor:
+            if not has_employees_table(cursor):
+                print("Таблица employees не найдена в базе данных", file=sys.stderr)
+                return 1
+            args.handler(cursor, args)
+    finally:
+        db.close_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
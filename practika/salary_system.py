@@ -1,95 +1,163 @@
 # salary_system_desktop_with_edit.py
+import time
+
+STARTED_AT = time.perf_counter()  # начало запуска (до импорта модулей) для журнала запуска
+
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
-import sqlite3
+from tkinter import ttk, messagebox, scrolledtext
 import csv
 import json
 from datetime import datetime
 import os
+import threading
 
-# ============================================================================
-# КЛАССЫ ДЛЯ РАСЧЕТОВ
-# ============================================================================
+from calculations import SalaryCalculator, TaxService, KopeckPayrollEngine, PayrollCache, check_working_days
+from database import (DB_PATH, ConnectionManager, bulk_upsert_employees, fetch_data_version,
+                      fetch_database_info, fetch_employee_stats, fetch_employees_page,
+                      fetch_employees_page_before, fetch_table_columns, find_employees,
+                      has_employees_table, has_search_index)
+from importers import (iter_json_employees, map_csv_row, map_json_item,
+                       preview_json_employees, stream_import)
+from metrics import LATENCY_BUCKETS, MetricsRegistry
+from migrations import migrate
+from payroll_runs import calculate_payroll_run, iter_payroll_run_lines, write_payroll_csv
+from reports import (REPORTS, ReportCache, ReportSpool, iter_report_lines, write_report,
+                     write_report_csv)
+from tracing import span
+from worker import BackgroundWorker
 
-class Employee:
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.full_name = kwargs.get('full_name', '')
-        self.position = kwargs.get('position', '')
-        self.base_salary = float(kwargs.get('base_salary', 0))
-        self.bank_account = kwargs.get('bank_account', '')
-        self.tax_id = kwargs.get('tax_id', '')
-        self.hire_date = kwargs.get('hire_date', '')
-        self.department = kwargs.get('department', '')
-        self.email = kwargs.get('email', '')
-        self.phone = kwargs.get('phone', '')
-        self.is_active = kwargs.get('is_active', True)
-    
-    def to_dict(self):
-        return self.__dict__.copy()
-
-class SalaryCalculator:
-    def __init__(self, tax_rate=0.13, overtime_rate=1.5):
-        self.tax_rate = tax_rate
-        self.overtime_rate = overtime_rate
-    
-    def calculate_base_salary(self, employee, worked_days, total_days):
-        daily_salary = employee.base_salary / total_days
-        return daily_salary * worked_days
-    
-    def calculate_overtime(self, overtime_hours, hourly_rate):
-        return overtime_hours * hourly_rate * self.overtime_rate
-    
-    def calculate_bonus(self, employee, kpi_score):
-        bonus_rates = {'A': 0.3, 'B': 0.15, 'C': 0.05, 'D': 0.0}
-        return employee.base_salary * bonus_rates.get(kpi_score, 0)
-    
-    def calculate_total_income(self, base_salary, bonus, overtime_pay, sick_pay=0, vacation_pay=0):
-        return base_salary + bonus + overtime_pay + sick_pay + vacation_pay
-
-class TaxService:
-    def __init__(self, ndfl_rate=0.13):
-        self.ndfl_rate = ndfl_rate
-    
-    def calculate_ndfl(self, total_income):
-        return total_income * self.ndfl_rate
-    
-    def calculate_net_salary(self, total_income, tax_amount):
-        return total_income - tax_amount
+MODULES_LOADED_AT = time.perf_counter()
 
 # ============================================================================
 # ГЛАВНОЕ ОКНО ПРИЛОЖЕНИЯ
 # ============================================================================
 
 class SalarySystemApp:
+    EMPLOYEES_PAGE_SIZE = 200  # строк, подгружаемых за один запрос
+    EMPLOYEES_WINDOW_SIZE = 1000  # максимум строк в таблице сотрудников
+    SEARCH_DELAY = 300  # мс без нажатий перед запуском поиска
+    SEARCH_LIMIT = 500  # максимум найденных строк
+    PAYROLL_CACHE_SIZE = 10000  # результатов расчета в кэше
+    PAYROLL_WORKERS = None  # процессов расчета (None - по числу ядер)
+    PAYROLL_PAGE_SIZE = 200  # строк результатов расчета, выводимых за раз
+    PAYROLL_WINDOW_SIZE = 1000  # максимум строк в таблице результатов
+    REPORT_PAGE_SIZE = 500  # строк отчета, подгружаемых в предпросмотр за раз
+    REPORT_WINDOW_SIZE = 3000  # максимум строк отчета в предпросмотре
+    REPORT_CACHE_SIZE = 8  # сформированных отчетов в кэше
+    DIAGNOSTICS_REFRESH = 5000  # мс между обновлениями открытой вкладки Диагностика
+    SLOW_SQL_LIMIT = 15  # запросов в списке самых медленных
+    # Операции, длительность которых показывается на вкладке Диагностика
+    DIAGNOSTIC_OPERATIONS = (
+        ('employees.load', "Загрузка сотрудников"),
+        ('employees.search', "Поиск сотрудников"),
+        ('payroll.calculate', "Расчет зарплаты"),
+        ('payroll.display', "Вывод результатов расчета"),
+        ('payroll.export', "Экспорт расчета в CSV"),
+        ('report.generate', "Формирование отчета"),
+        ('report.save', "Сохранение отчета"),
+        ('import', "Импорт из 1С"),
+        ('startup', "Запуск до первой отрисовки")
+    )
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Система расчета заработной платы")
         self.root.geometry("1200x700")
         
         # Инициализация компонентов
-        self.db_path = "salary_system.db"
+        self.db_path = DB_PATH
+        self.metrics = MetricsRegistry()
+        self.db = ConnectionManager(self.db_path, on_statement=self.metrics.observe_sql)
         self.calculator = SalaryCalculator()
         self.tax_service = TaxService()
-        
-        # Создание вкладок
+        self.payroll_engine = None  # создается вместе с вкладкой Расчет ЗП
+        self.payroll_cache = PayrollCache(self.PAYROLL_CACHE_SIZE)
+        self.busy_labels = {}
+        self.worker = BackgroundWorker(root, on_busy_change=self.set_tab_busy)
+        self.reload_employees_pending = False
+        self.employees_generation = 0
+        self.employees_more_before = False
+        self.employees_more_after = False
+        self.search_after_id = None
+        self.search_index_ready = False
+        self.database_ready = False  # миграции схемы применены
+        self.employee_columns = None  # столбцы employees, читаются один раз
+        self.payroll_export = None  # (id расчета, выбранные сотрудники) для экспорта
+        self.payroll_results = None  # (ФИО, столбцы сумм) последнего расчета
+        self.payroll_window = (0, 0)  # строки результатов [начало, конец) в таблице
+        self.report_spool = None
+        self.report_request = None
+        self.report_type = None
+        self.report_window = (0, 0)  # строки отчета [начало, конец) в предпросмотре
+        self.report_cache = ReportCache(self.REPORT_CACHE_SIZE)
+        self.diagnostics_after_id = None
+        
+        self.pending_employees = None  # первая страница, загруженная до открытия вкладки
+        
+        # Создание вкладок: пустые рамки сразу, содержимое - при первом открытии
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Создание вкладок
-        self.create_dashboard_tab()
-        self.create_employees_tab()
-        self.create_payroll_tab()
-        self.create_reports_tab()
-        self.create_import_tab()
+        self.tab_frames = {}
+        self.tab_builders = {}
+        self.built_tabs = set()
+        for key, title, builder in (
+            ('dashboard', 'Дашборд', self.create_dashboard_tab),
+            ('employees', 'Сотрудники', self.create_employees_tab),
+            ('payroll', 'Расчет ЗП', self.create_payroll_tab),
+            ('reports', 'Отчеты', self.create_reports_tab),
+            ('import', 'Импорт', self.create_import_tab),
+            ('diagnostics', 'Диагностика', self.create_diagnostics_tab)
+        ):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=title)
+            self.tab_frames[key] = frame
+            self.tab_builders[key] = builder
+        
+        self.build_tab('dashboard')
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
+        # Данные загружаются после первой отрисовки окна
+        self.root.bind('<Map>', self.on_first_map)
+    
+    def build_tab(self, key):
+        """Создание содержимого вкладки при первом открытии"""
+        if key in self.built_tabs:
+            return
+        self.built_tabs.add(key)
+        with span('ui.build_tab', 'ui', tab=key):
+            self.tab_builders[key](self.tab_frames[key])
+    
+    def is_tab_selected(self, key):
+        return self.notebook.select() == str(self.tab_frames[key])
+    
+    def on_tab_changed(self, event=None):
+        """Переключение вкладок: построение вкладки, обновление Диагностики"""
+        key = next(key for key, frame in self.tab_frames.items() if self.notebook.select() == str(frame))
+        self.build_tab(key)
+        if key == 'diagnostics':
+            self.refresh_diagnostics()
+    
+    def on_first_map(self, event):
+        """Окно показано: запись времени запуска и загрузка данных в фоне"""
+        if event.widget is not self.root:
+            return
+        self.root.unbind('<Map>')
+        self.root.update_idletasks()  # дорисовать окно до запуска заданий
         
-        # Загрузка данных при запуске
-        self.load_employees()
+        first_paint = time.perf_counter() - STARTED_AT
+        self.metrics.observe('startup', first_paint)
+        print(f"Запуск: окно отрисовано через {first_paint * 1000:.0f} мс "
+              f"(импорт модулей {(MODULES_LOADED_AT - STARTED_AT) * 1000:.0f} мс)")
         
-    def create_dashboard_tab(self):
+        # Дашборд и первая страница сотрудников - из существующих таблиц,
+        # миграции схемы (индексы, поиск) - параллельно с ними в фоне
+        self.refresh_dashboard()
+        self.load_employees()
+        self.prepare_database()
+    
+    def create_dashboard_tab(self, dashboard_frame):
         """Создание вкладки Дашборд"""
-        dashboard_frame = ttk.Frame(self.notebook)
-        self.notebook.add(dashboard_frame, text='Дашборд')
         
         # Заголовок
         title_label = ttk.Label(dashboard_frame, 
@@ -132,10 +200,8 @@ class SalarySystemApp:
         ttk.Label(info_frame, text="База данных: salary_system.db").pack(anchor='w')
         ttk.Label(info_frame, text=f"Дата: {datetime.now().strftime('%d.%m.%Y')}").pack(anchor='w')
         
-    def create_employees_tab(self):
+    def create_employees_tab(self, employees_frame):
         """Создание вкладки Сотрудники"""
-        employees_frame = ttk.Frame(self.notebook)
-        self.notebook.add(employees_frame, text='Сотрудники')
         
         # Панель управления
         control_frame = ttk.Frame(employees_frame)
@@ -172,20 +238,34 @@ class SalarySystemApp:
         self.employees_tree.column('ФИО', width=200)
         self.employees_tree.column('Должность', width=150)
         
-        # Скроллбар
-        scrollbar = ttk.Scrollbar(employees_frame, orient='vertical', command=self.employees_tree.yview)
-        self.employees_tree.configure(yscrollcommand=scrollbar.set)
+        # Скроллбар: в таблице хранится только окно строк, остальные
+        # подгружаются страницами при прокрутке к краю окна
+        self.employees_scrollbar = ttk.Scrollbar(employees_frame, orient='vertical', 
+                                                 command=self.employees_tree.yview)
+        self.employees_tree.configure(yscrollcommand=self.on_employees_scroll)
+        
+        self.create_busy_label(employees_frame, 'employees')
         
         self.employees_tree.pack(side='left', fill='both', expand=True, padx=(10, 0), pady=10)
-        scrollbar.pack(side='right', fill='y', padx=(0, 10), pady=10)
+        self.employees_scrollbar.pack(side='right', fill='y', padx=(0, 10), pady=10)
         
         # Привязка двойного клика
         self.employees_tree.bind('<Double-Button-1>', self.view_employee_details)
         
-    def create_payroll_tab(self):
+        # Первая страница могла загрузиться в фоне до открытия вкладки
+        if self.pending_employees is not None:
+            data, self.pending_employees = self.pending_employees, None
+            self.show_employees(data)
+        else:
+            self.load_employees()
+        
+    def create_payroll_tab(self, payroll_frame):
         """Создание вкладки Расчет ЗП"""
-        payroll_frame = ttk.Frame(self.notebook)
-        self.notebook.add(payroll_frame, text='Расчет ЗП')
+        # multiprocessing и пул процессов нужны только для расчета
+        from parallel_payroll import ParallelPayrollEngine
+        self.payroll_engine = ParallelPayrollEngine(KopeckPayrollEngine(self.calculator, self.tax_service),
+                                                    workers=self.PAYROLL_WORKERS)
+        
         
         # Левая панель - параметры расчета
         left_frame = ttk.Frame(payroll_frame)
@@ -232,6 +312,8 @@ class SalarySystemApp:
         ttk.Button(button_frame, text="Экспорт в CSV", 
                   command=self.export_payroll_csv).pack(pady=5)
         
+        self.create_busy_label(left_frame, 'payroll')
+        
         # Правая панель - результаты расчета
         right_frame = ttk.Frame(payroll_frame)
         right_frame.pack(side='right', fill='both', expand=True, padx=10, pady=10)
@@ -246,12 +328,13 @@ class SalarySystemApp:
         
         self.payroll_tree.column('ФИО', width=150)
         
-        # Скроллбар
-        scrollbar = ttk.Scrollbar(right_frame, orient='vertical', command=self.payroll_tree.yview)
-        self.payroll_tree.configure(yscrollcommand=scrollbar.set)
+        # Скроллбар: в таблице только окно строк результатов, остальные
+        # выводятся страницами при прокрутке к краю окна
+        self.payroll_scrollbar = ttk.Scrollbar(right_frame, orient='vertical', command=self.payroll_tree.yview)
+        self.payroll_tree.configure(yscrollcommand=self.on_payroll_scroll)
         
         self.payroll_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.payroll_scrollbar.pack(side='right', fill='y')
         
         # Итоги
         summary_frame = ttk.LabelFrame(right_frame, text="Итоги", padding=10)
@@ -266,10 +349,8 @@ class SalarySystemApp:
         self.total_net_label = ttk.Label(summary_frame, text="К выплате: 0 ₽")
         self.total_net_label.pack(side='left', padx=20)
         
-    def create_reports_tab(self):
+    def create_reports_tab(self, reports_frame):
         """Создание вкладки Отчеты"""
-        reports_frame = ttk.Frame(self.notebook)
-        self.notebook.add(reports_frame, text='Отчеты')
         
         # Виджеты для отчетов
         ttk.Label(reports_frame, text="Генерация отчетов", 
@@ -278,14 +359,7 @@ class SalarySystemApp:
         reports_list_frame = ttk.Frame(reports_frame)
         reports_list_frame.pack(pady=10)
         
-        reports = [
-            ("Расчетная ведомость", "payroll_report"),
-            ("Список сотрудников", "employee_list"),
-            ("Налоговый отчет", "tax_report"),
-            ("Отчет по отделам", "department_report")
-        ]
-        
-        for report_name, report_code in reports:
+        for report_name, report_code in REPORTS:
             frame = ttk.Frame(reports_list_frame)
             frame.pack(fill='x', pady=5, padx=50)
             
@@ -293,10 +367,16 @@ class SalarySystemApp:
             ttk.Button(frame, text="Сгенерировать", 
                       command=lambda rc=report_code: self.generate_report(rc)).pack(side='right')
         
+        self.create_busy_label(reports_frame, 'reports')
+        
         # Текстовое поле для предпросмотра
         ttk.Label(reports_frame, text="Предпросмотр отчета:").pack(pady=10)
         
+        self.report_info_label = ttk.Label(reports_frame, text="")
+        self.report_info_label.pack()
+        
         self.report_text = scrolledtext.ScrolledText(reports_frame, height=15, width=100)
+        self.report_text.configure(yscrollcommand=self.on_report_scroll)
         self.report_text.pack(padx=20, pady=10)
         
         # Кнопки управления отчетом
@@ -308,12 +388,10 @@ class SalarySystemApp:
         ttk.Button(button_frame, text="Сохранить как TXT", 
                   command=self.save_report_txt).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Очистить", 
-                  command=lambda: self.report_text.delete(1.0, tk.END)).pack(side='left', padx=5)
+                  command=self.clear_report).pack(side='left', padx=5)
         
-    def create_import_tab(self):
+    def create_import_tab(self, import_frame):
         """Создание вкладки Импорт"""
-        import_frame = ttk.Frame(self.notebook)
-        self.notebook.add(import_frame, text='Импорт')
         
         ttk.Label(import_frame, text="Импорт данных из 1С", 
                  font=('Arial', 14, 'bold')).pack(pady=20)
@@ -350,9 +428,30 @@ class SalarySystemApp:
         ttk.Checkbutton(params_frame, text="Создавать отсутствующих сотрудников", 
                        variable=self.create_missing_var).pack(anchor='w')
         
-        # Кнопка импорта
-        ttk.Button(import_frame, text="Импортировать данные", 
-                  command=self.import_from_1c).pack(pady=20)
+        self.stream_import_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(params_frame, text="Потоковый импорт частями (для больших файлов)", 
+                       variable=self.stream_import_var).pack(anchor='w')
+        
+        # Кнопки импорта
+        import_buttons_frame = ttk.Frame(import_frame)
+        import_buttons_frame.pack(pady=10)
+        
+        self.import_button = ttk.Button(import_buttons_frame, text="Импортировать данные", 
+                                        command=self.import_from_1c)
+        self.import_button.pack(side='left', padx=5)
+        self.cancel_import_button = ttk.Button(import_buttons_frame, text="Отмена", 
+                                               command=self.cancel_import, state='disabled')
+        self.cancel_import_button.pack(side='left', padx=5)
+        
+        # Ход импорта
+        progress_frame = ttk.Frame(import_frame)
+        progress_frame.pack(padx=20, fill='x')
+        
+        self.import_progress = ttk.Progressbar(progress_frame, maximum=100)
+        self.import_progress.pack(fill='x')
+        self.import_progress_label = ttk.Label(progress_frame, text="")
+        self.import_progress_label.pack(anchor='w')
+        self.create_busy_label(progress_frame, 'import')
         
         # Область предпросмотра
         preview_frame = ttk.LabelFrame(import_frame, text="Предпросмотр данных", padding=10)
@@ -361,62 +460,238 @@ class SalarySystemApp:
         self.import_text = scrolledtext.ScrolledText(preview_frame, height=15)
         self.import_text.pack(fill='both', expand=True)
         
+    def create_diagnostics_tab(self, diagnostics_frame):
+        """Создание вкладки Диагностика"""
+        
+        # Длительность операций и гистограмма выбранной операции
+        operations_frame = ttk.LabelFrame(diagnostics_frame, text="Длительность операций", padding=10)
+        operations_frame.pack(fill='x', padx=10, pady=5)
+        
+        columns = ('Операция', 'Запусков', 'Ошибок', 'p50, мс', 'p95, мс', 'Макс., мс', 'Последняя, мс')
+        self.operations_tree = ttk.Treeview(operations_frame, columns=columns, show='headings', height=8)
+        
+        for col in columns:
+            self.operations_tree.heading(col, text=col)
+            self.operations_tree.column(col, width=90, anchor='e')
+        
+        self.operations_tree.column('Операция', width=200, anchor='w')
+        for key, title in self.DIAGNOSTIC_OPERATIONS:
+            self.operations_tree.insert('', 'end', iid=key, values=(title, 0, 0, '', '', '', ''))
+        self.operations_tree.bind('<<TreeviewSelect>>', lambda e: self.show_latency_histogram())
+        self.operations_tree.pack(side='left', fill='both', expand=True)
+        
+        self.histogram_text = tk.Text(operations_frame, height=17, width=48, font=('Courier', 9))
+        self.histogram_text.pack(side='right', fill='y', padx=(10, 0))
+        
+        # База данных и кэши
+        info_frame = ttk.Frame(diagnostics_frame)
+        info_frame.pack(fill='x', padx=10, pady=5)
+        
+        db_frame = ttk.LabelFrame(info_frame, text="База данных", padding=10)
+        db_frame.pack(side='left', fill='both', expand=True, padx=(0, 5))
+        self.db_info_label = ttk.Label(db_frame, text="", justify='left')
+        self.db_info_label.pack(anchor='w')
+        
+        cache_frame = ttk.LabelFrame(info_frame, text="Кэши", padding=10)
+        cache_frame.pack(side='left', fill='both', expand=True, padx=(5, 0))
+        self.cache_info_label = ttk.Label(cache_frame, text="", justify='left')
+        self.cache_info_label.pack(anchor='w')
+        
+        # Самые медленные из последних запросов
+        sql_frame = ttk.LabelFrame(diagnostics_frame, text="Самые медленные из последних запросов",
+                                   padding=10)
+        sql_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        columns = ('мс', 'Строк', 'Время', 'Запрос')
+        self.slow_sql_tree = ttk.Treeview(sql_frame, columns=columns, show='headings', height=6)
+        
+        for col in columns:
+            self.slow_sql_tree.heading(col, text=col)
+            self.slow_sql_tree.column(col, width=80, anchor='e', stretch=False)
+        
+        self.slow_sql_tree.column('Запрос', width=800, anchor='w', stretch=True)
+        
+        scrollbar = ttk.Scrollbar(sql_frame, orient='vertical', command=self.slow_sql_tree.yview)
+        self.slow_sql_tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.slow_sql_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        # Кнопки
+        button_frame = ttk.Frame(diagnostics_frame)
+        button_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Button(button_frame, text="Обновить", 
+                  command=self.refresh_diagnostics).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Сбросить замеры", 
+                  command=self.reset_diagnostics).pack(side='left', padx=5)
+    
+    def create_busy_label(self, parent, key):
+        """Индикатор выполнения фонового задания на вкладке"""
+        label = ttk.Label(parent, text="", foreground='gray')
+        label.pack(anchor='w', padx=10)
+        self.busy_labels[key] = label
+    
     # ============================================================================
-    # МЕТОДЫ РАБОТЫ С БАЗОЙ ДАННЫХ
+    # ФОНОВЫЕ ЗАДАНИЯ
     # ============================================================================
     
-    def get_connection(self):
-        """Получение соединения с базой данных"""
-        try:
-            return sqlite3.connect(self.db_path)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось подключиться к базе данных:\n{e}")
-            return None
+    def set_tab_busy(self, key, busy):
+        """Показать или скрыть индикатор задания на вкладке"""
+        label = self.busy_labels.get(key)
+        if label:
+            label.config(text="Выполняется..." if busy else "")
+    
+    def timed(self, name, func):
+        """func с записью длительности выполнения в метрику name"""
+        def run():
+            with self.metrics.timer(name):
+                return func()
+        return run
+    
+    def run_job(self, key, func, on_success, error_message):
+        """Запуск задания в фоне; повторный запуск до завершения игнорируется"""
+        def on_error(e):
+            messagebox.showerror("Ошибка", f"{error_message}:\n{e}")
+        
+        if not self.worker.submit(key, func, on_success, on_error):
+            label = self.busy_labels.get(key)
+            if label:
+                label.config(text="Выполняется... Дождитесь завершения текущей операции")
+            return False
+        return True
+    
+    # ============================================================================
+    # МЕТОДЫ РАБОТЫ С БАЗОЙ ДАННЫХ
+    # ============================================================================
     
     def load_employees(self):
         """Загрузка списка сотрудников из базы данных"""
+        # Данные изменились во время загрузки - перечитаем после нее
+        if self.worker.is_busy('employees'):
+            self.reload_employees_pending = True
+            return
+        
+        def job():
+            with self.db.cursor() as cursor:
+                # Проверяем существование таблицы
+                if not has_employees_table(cursor):
+                    return None
+                
+                # Статистика и первая страница сотрудников
+                stats = fetch_employee_stats(cursor)
+                page = fetch_employees_page(cursor, 0, self.EMPLOYEES_PAGE_SIZE)
+                return stats, page
+        
+        self.run_job('employees', self.timed('employees.load', job), self.show_employees,
+                     "Не удалось загрузить сотрудников")
+    
+    def show_employees(self, data):
+        """Заполнение таблицы сотрудников первой страницей"""
+        if self.reload_employees_pending:
+            self.reload_employees_pending = False
+            self.load_employees()
+        
         try:
-            conn = self.get_connection()
-            if not conn:
+            if data is None:
+                # Новая база: таблицу создают миграции, после них список перечитается
                 return
             
-            cursor = conn.cursor()
+            stats, page = data
             
-            # Проверяем существование таблицы
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='employees'")
-            if not cursor.fetchone():
-                messagebox.showwarning("Внимание", "Таблица employees не найдена в базе данных")
-                conn.close()
+            if 'employees' not in self.built_tabs:
+                # Таблица заполнится при открытии вкладки
+                self.pending_employees = data
+                self.update_dashboard_stats(*stats)
                 return
             
-            # Получаем всех сотрудников
-            cursor.execute("SELECT id, full_name, position, department, base_salary, is_active FROM employees")
-            employees = cursor.fetchall()
-            conn.close()
-            
-            # Очищаем таблицу
-            for item in self.employees_tree.get_children():
-                self.employees_tree.delete(item)
+            # Очищаем таблицу; страницы, загружаемые для старого списка, отбрасываются
+            self.employees_generation += 1
+            self.employees_tree.delete(*self.employees_tree.get_children())
             
             # Заполняем таблицу
-            for emp in employees:
-                status = "Активен" if emp[5] else "Неактивен"
-                self.employees_tree.insert('', 'end', values=(
-                    emp[0], emp[1], emp[2], emp[3], f"{emp[4]:,.2f} ₽", status
-                ))
+            self.insert_employee_rows(page, 'end')
+            self.employees_more_before = False
+            self.employees_more_after = len(page) == self.EMPLOYEES_PAGE_SIZE
             
             # Обновляем статистику на дашборде
-            self.update_dashboard_stats(employees)
+            self.update_dashboard_stats(*stats)
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить сотрудников:\n{e}")
     
-    def update_dashboard_stats(self, employees):
+    def insert_employee_rows(self, rows, index):
+        """Вставка строк сотрудников в таблицу (iid строки - ID сотрудника)"""
+        for emp in rows:
+            if self.employees_tree.exists(emp[0]):
+                continue
+            status = "Активен" if emp[5] else "Неактивен"
+            self.employees_tree.insert('', index, iid=emp[0], values=(
+                emp[0], emp[1], emp[2], emp[3], f"{emp[4]:,.2f} ₽", status
+            ))
+            if index != 'end':
+                index += 1
+    
+    def on_employees_scroll(self, first, last):
+        """Прокрутка таблицы сотрудников: подгрузка страниц у краев окна"""
+        self.employees_scrollbar.set(first, last)
+        if float(last) > 0.9 and self.employees_more_after:
+            self.load_employees_page(forward=True)
+        elif float(first) < 0.1 and self.employees_more_before:
+            self.load_employees_page(forward=False)
+    
+    def load_employees_page(self, forward):
+        """Загрузка следующей (forward) или предыдущей страницы сотрудников"""
+        if self.worker.is_busy('employees') or self.worker.is_busy('employees_page'):
+            return
+        
+        children = self.employees_tree.get_children()
+        if not children:
+            return
+        
+        generation = self.employees_generation
+        anchor_id = int(children[-1] if forward else children[0])
+        
+        def job():
+            with self.db.cursor() as cursor:
+                if forward:
+                    return fetch_employees_page(cursor, anchor_id, self.EMPLOYEES_PAGE_SIZE)
+                return fetch_employees_page_before(cursor, anchor_id, self.EMPLOYEES_PAGE_SIZE)
+        
+        def done(page):
+            if generation == self.employees_generation:
+                self.show_employees_page(page, forward)
+        
+        self.worker.submit('employees_page', job, done)
+    
+    def show_employees_page(self, page, forward):
+        """Добавление страницы в окно таблицы с удалением строк с другого края"""
+        tree = self.employees_tree
+        full_page = len(page) == self.EMPLOYEES_PAGE_SIZE
+        
+        if forward:
+            self.insert_employee_rows(page, 'end')
+            self.employees_more_after = full_page
+        else:
+            self.insert_employee_rows(page, 0)
+            # Сохраняем видимые строки на месте после вставки сверху
+            tree.yview_scroll(len(page), 'units')
+            self.employees_more_before = full_page
+        
+        children = tree.get_children()
+        excess = len(children) - self.EMPLOYEES_WINDOW_SIZE
+        if excess > 0:
+            if forward:
+                tree.delete(*children[:excess])
+                tree.yview_scroll(-excess, 'units')
+                self.employees_more_before = True
+            else:
+                tree.delete(*children[-excess:])
+                self.employees_more_after = True
+    
+    def update_dashboard_stats(self, total, active, total_salary):
         """Обновление статистики на дашборде"""
         try:
-            total = len(employees)
-            active = sum(1 for emp in employees if emp[5])
-            total_salary = sum(emp[4] for emp in employees)
             avg_salary = total_salary / total if total > 0 else 0
             
             self.total_employees_label.config(text=f"Всего сотрудников: {total}")
@@ -427,28 +702,93 @@ class SalarySystemApp:
         except Exception as e:
             print(f"Ошибка обновления статистики: {e}")
     
+    def prepare_database(self):
+        """Применение миграций схемы в фоне.
+        
+        Данные при запуске загружаются, не дожидаясь миграций; после
+        примененных миграций (например, создания таблиц в новой базе)
+        дашборд и список сотрудников перечитываются. Запись в базу до их
+        завершения не выполняется (см. check_database_ready).
+        """
+        def job():
+            with self.db.cursor() as cursor:
+                applied = migrate(cursor)
+                return applied, has_search_index(cursor), fetch_table_columns(cursor, 'employees')
+        
+        def done(result):
+            applied, self.search_index_ready, self.employee_columns = result
+            self.database_ready = True
+            if applied:
+                print(f"Применены миграции базы данных: {', '.join(map(str, applied))}")
+                self.refresh_dashboard()
+                self.load_employees()
+        
+        self.run_job('prepare_database', job, done, "Не удалось обновить структуру базы данных")
+    
+    def check_database_ready(self):
+        """Можно ли менять данные: в новой базе таблицы создают миграции"""
+        if not self.database_ready:
+            messagebox.showwarning("Внимание", "Структура базы данных еще обновляется, "
+                                              "повторите через несколько секунд")
+        return self.database_ready
+    
+    def fetch_employee(self, cursor, employee_id):
+        """Строка сотрудника и имена столбцов employees.
+        
+        Схема меняется только миграциями при запуске, поэтому столбцы
+        читаются один раз, а не для каждого сотрудника.
+        """
+        if self.employee_columns is None:
+            self.employee_columns = fetch_table_columns(cursor, 'employees')
+        cursor.execute(f"SELECT {', '.join(self.employee_columns)} FROM employees WHERE id = ?",
+                       (employee_id,))
+        return cursor.fetchone(), self.employee_columns
+    
+    def refresh_dashboard(self):
+        """Обновление статистики дашборда из таблицы агрегатов"""
+        def job():
+            with self.db.cursor() as cursor:
+                if not has_employees_table(cursor):
+                    return 0, 0, 0
+                return fetch_employee_stats(cursor)
+        
+        self.worker.submit('dashboard', job, lambda stats: self.update_dashboard_stats(*stats))
+    
     def search_employees(self, event=None):
-        """Поиск сотрудников"""
-        query = self.search_var.get().lower()
+        """Поиск сотрудников: запуск после паузы в наборе текста"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DELAY, self.run_search)
+    
+    def run_search(self):
+        """Поиск сотрудников по индексу и вывод найденных строк"""
+        self.search_after_id = None
+        query = self.search_var.get().strip()
         
         # Показываем всех сотрудников если запрос пустой
         if not query:
-            for item in self.employees_tree.get_children():
-                self.employees_tree.item(item, tags=())
+            self.load_employees()
             return
         
-        # Скрываем несовпадающие строки
-        for item in self.employees_tree.get_children():
-            values = self.employees_tree.item(item, 'values')
-            if values:
-                # Ищем по всем видимым полям
-                text = ' '.join(str(v).lower() for v in values)
-                if query in text:
-                    self.employees_tree.item(item, tags=())
-                else:
-                    self.employees_tree.item(item, tags=('hidden',))
+        use_index = self.search_index_ready
+        
+        def job():
+            with self.db.cursor() as cursor:
+                return find_employees(cursor, query, self.SEARCH_LIMIT, use_index)
+        
+        def done(rows):
+            # Запрос изменился, пока шел поиск - ищем заново
+            if self.search_var.get().strip() != query:
+                self.run_search()
+                return
+            
+            self.employees_generation += 1
+            self.employees_tree.delete(*self.employees_tree.get_children())
+            self.insert_employee_rows(rows, 'end')
+            self.employees_more_before = False
+            self.employees_more_after = False
         
-        self.employees_tree.tag_configure('hidden', foreground='gray')
+        self.run_job('search', self.timed('employees.search', job), done, "Не удалось выполнить поиск")
     
     # ============================================================================
     # ДИАЛОГОВЫЕ ОКНА (ДОБАВЛЕНИЕ И РЕДАКТИРОВАНИЕ)
@@ -558,25 +898,12 @@ class SalarySystemApp:
     def get_employee_by_id(self, employee_id):
         """Получить данные сотрудника по ID"""
         try:
-            conn = self.get_connection()
-            if not conn:
-                return None
-            
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
-            emp = cursor.fetchone()
-            conn.close()
+            with self.db.cursor() as cursor:
+                emp, columns = self.fetch_employee(cursor, employee_id)
             
             if not emp:
                 return None
             
-            # Получаем названия колонок
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(employees)")
-            columns = [col[1] for col in cursor.fetchall()]
-            conn.close()
-            
             # Создаем словарь с данными
             employee_data = {'id': employee_id}
             for i, col in enumerate(columns):
@@ -591,65 +918,39 @@ class SalarySystemApp:
     
     def save_employee(self, entries, dialog):
         """Сохранение нового сотрудника в базу данных"""
+        if not self.check_database_ready():
+            return
+        
         try:
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
-            
-            # Проверяем существование таблицы
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='employees'")
-            if not cursor.fetchone():
-                # Создаем таблицу если она не существует
+            with self.db.cursor() as cursor:
+                # Получаем значения из полей
+                values = {}
+                for key, entry in entries.items():
+                    if key == 'is_active':
+                        values[key] = entry.get()  # Для BooleanVar
+                    else:
+                        value = entry.get().strip()
+                        if key == 'base_salary':
+                            value = float(value) if value else 0
+                        values[key] = value
+                
+                # Вставляем запись
                 cursor.execute('''
-                    CREATE TABLE employees (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        full_name TEXT NOT NULL,
-                        position TEXT NOT NULL,
-                        base_salary REAL NOT NULL,
-                        department TEXT,
-                        bank_account TEXT,
-                        tax_id TEXT,
-                        email TEXT,
-                        phone TEXT,
-                        hire_date TEXT,
-                        is_active BOOLEAN DEFAULT TRUE,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            
-            # Получаем значения из полей
-            values = {}
-            for key, entry in entries.items():
-                if key == 'is_active':
-                    values[key] = entry.get()  # Для BooleanVar
-                else:
-                    value = entry.get().strip()
-                    if key == 'base_salary':
-                        value = float(value) if value else 0
-                    values[key] = value
-            
-            # Вставляем запись
-            cursor.execute('''
-                INSERT INTO employees (full_name, position, base_salary, department, 
-                                      bank_account, tax_id, email, phone, hire_date, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                values['full_name'],
-                values['position'],
-                values['base_salary'],
-                values['department'],
-                values.get('bank_account', ''),
-                values.get('tax_id', ''),
-                values.get('email', ''),
-                values.get('phone', ''),
-                values.get('hire_date', ''),
-                values.get('is_active', True)
-            ))
-            
-            conn.commit()
-            conn.close()
+                    INSERT INTO employees (full_name, position, base_salary, department, 
+                                          bank_account, tax_id, email, phone, hire_date, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    values['full_name'],
+                    values['position'],
+                    values['base_salary'],
+                    values['department'],
+                    values.get('bank_account', ''),
+                    values.get('tax_id', ''),
+                    values.get('email', ''),
+                    values.get('phone', ''),
+                    values.get('hire_date', ''),
+                    values.get('is_active', True)
+                ))
             
             messagebox.showinfo("Успех", "Сотрудник успешно добавлен")
             dialog.destroy()
@@ -665,12 +966,6 @@ class SalarySystemApp:
                 messagebox.showerror("Ошибка", "Не выбран сотрудник для редактирования")
                 return
             
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
-            
             # Получаем значения из полей
             values = {}
             for key, entry in entries.items():
@@ -682,29 +977,27 @@ class SalarySystemApp:
                         value = float(value) if value else 0
                     values[key] = value
             
-            # Обновляем запись
-            cursor.execute('''
-                UPDATE employees 
-                SET full_name = ?, position = ?, base_salary = ?, department = ?, 
-                    bank_account = ?, tax_id = ?, email = ?, phone = ?, 
-                    hire_date = ?, is_active = ?
-                WHERE id = ?
-            ''', (
-                values['full_name'],
-                values['position'],
-                values['base_salary'],
-                values['department'],
-                values.get('bank_account', ''),
-                values.get('tax_id', ''),
-                values.get('email', ''),
-                values.get('phone', ''),
-                values.get('hire_date', ''),
-                values.get('is_active', True),
-                self.current_edit_id
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self.db.cursor() as cursor:
+                # Обновляем запись
+                cursor.execute('''
+                    UPDATE employees 
+                    SET full_name = ?, position = ?, base_salary = ?, department = ?, 
+                        bank_account = ?, tax_id = ?, email = ?, phone = ?, 
+                        hire_date = ?, is_active = ?
+                    WHERE id = ?
+                ''', (
+                    values['full_name'],
+                    values['position'],
+                    values['base_salary'],
+                    values['department'],
+                    values.get('bank_account', ''),
+                    values.get('tax_id', ''),
+                    values.get('email', ''),
+                    values.get('phone', ''),
+                    values.get('hire_date', ''),
+                    values.get('is_active', True),
+                    self.current_edit_id
+                ))
             
             messagebox.showinfo("Успех", "Данные сотрудника успешно обновлены")
             dialog.destroy()
@@ -723,14 +1016,8 @@ class SalarySystemApp:
         employee_id = item['values'][0]
         
         try:
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
-            emp = cursor.fetchone()
-            conn.close()
+            with self.db.cursor() as cursor:
+                emp, columns = self.fetch_employee(cursor, employee_id)
             
             if not emp:
                 messagebox.showwarning("Внимание", "Сотрудник не найден")
@@ -741,13 +1028,6 @@ class SalarySystemApp:
             dialog.title(f"Информация о сотруднике: {emp[1]}")
             dialog.geometry("500x400")
             
-            # Получаем названия колонок
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(employees)")
-            columns = [col[1] for col in cursor.fetchall()]
-            conn.close()
-            
             # Отображаем информацию
             text = scrolledtext.ScrolledText(dialog, height=20)
             text.pack(fill='both', expand=True, padx=10, pady=10)
@@ -792,14 +1072,8 @@ class SalarySystemApp:
         if messagebox.askyesno("Подтверждение", 
                               f"Вы уверены, что хотите удалить сотрудника:\n{employee_name}?"):
             try:
-                conn = self.get_connection()
-                if not conn:
-                    return
-                
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
-                conn.commit()
-                conn.close()
+                with self.db.cursor() as cursor:
+                    cursor.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
                 
                 messagebox.showinfo("Успех", "Сотрудник успешно удален")
                 self.load_employees()
@@ -813,408 +1087,368 @@ class SalarySystemApp:
     
     def calculate_all_payroll(self):
         """Расчет зарплаты для всех сотрудников"""
+        if not self.check_database_ready():
+            return
+        
         try:
             # Получаем параметры расчета
             month = self.month_var.get()
             total_days = int(self.working_days_var.get())
             worked_days = int(self.worked_days_var.get())
+            check_working_days(total_days)
             kpi_score = self.bonus_kpi_var.get()
             overtime_hours = float(self.overtime_var.get())
             
-            # Загружаем сотрудников
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, full_name, position, base_salary FROM employees WHERE is_active = 1")
-            employees = cursor.fetchall()
-            conn.close()
-            
-            # Очищаем таблицу результатов
-            for item in self.payroll_tree.get_children():
-                self.payroll_tree.delete(item)
-            
-            total_income_sum = 0
-            total_tax_sum = 0
-            total_net_sum = 0
+            def job():
+                # Пересчитываются только сотрудники, изменившиеся после прошлого расчета
+                with self.db.cursor() as cursor:
+                    return calculate_payroll_run(cursor, self.payroll_engine, month, worked_days,
+                                                 total_days, kpi_score, overtime_hours,
+                                                 cache=self.payroll_cache)
             
-            # Рассчитываем для каждого сотрудника
-            for emp in employees:
-                employee = Employee(
-                    id=emp[0],
-                    full_name=emp[1],
-                    position=emp[2],
-                    base_salary=emp[3]
-                )
-                
-                # Расчеты
-                base_salary = self.calculator.calculate_base_salary(
-                    employee, worked_days, total_days
-                )
-                
-                bonus = self.calculator.calculate_bonus(employee, kpi_score)
-                
-                hourly_rate = employee.base_salary / 176  # 176 рабочих часов в месяце
-                overtime_pay = self.calculator.calculate_overtime(overtime_hours, hourly_rate)
-                
-                total_income = self.calculator.calculate_total_income(base_salary, bonus, overtime_pay)
-                tax_amount = self.tax_service.calculate_ndfl(total_income)
-                net_salary = self.tax_service.calculate_net_salary(total_income, tax_amount)
-                
-                # Добавляем в таблицу
-                self.payroll_tree.insert('', 'end', values=(
-                    employee.full_name,
-                    f"{base_salary:,.2f} ₽",
-                    f"{bonus:,.2f} ₽",
-                    f"{overtime_pay:,.2f} ₽",
-                    f"{total_income:,.2f} ₽",
-                    f"{tax_amount:,.2f} ₽",
-                    f"{net_salary:,.2f} ₽"
-                ))
-                
-                # Суммируем итоги
-                total_income_sum += total_income
-                total_tax_sum += tax_amount
-                total_net_sum += net_salary
+            def done(data):
+                run_id, names, result, recalculated = data
+                self.payroll_export = (run_id, None)
+                self.show_payroll_results(names, result)
+                messagebox.showinfo("Успех", f"Расчет завершен для {len(names)} сотрудников\n"
+                                             f"Пересчитано: {recalculated}")
             
-            # Обновляем итоги
-            self.total_income_label.config(text=f"Общая сумма: {total_income_sum:,.2f} ₽")
-            self.total_tax_label.config(text=f"Общий НДФЛ: {total_tax_sum:,.2f} ₽")
-            self.total_net_label.config(text=f"К выплате: {total_net_sum:,.2f} ₽")
-            
-            messagebox.showinfo("Успех", f"Расчет завершен для {len(employees)} сотрудников")
+            self.run_job('payroll', self.timed('payroll.calculate', job), done,
+                         "Не удалось выполнить расчет")
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось выполнить расчет:\n{e}")
     
     def calculate_selected_payroll(self):
         """Расчет зарплаты для выбранных сотрудников"""
-        selection = self.employees_tree.selection()
+        selection = self.employees_tree.selection() if 'employees' in self.built_tabs else ()
         if not selection:
             messagebox.showwarning("Внимание", "Выберите сотрудников для расчета")
             return
+        if not self.check_database_ready():
+            return
         
         try:
             # Получаем параметры расчета
             month = self.month_var.get()
             total_days = int(self.working_days_var.get())
             worked_days = int(self.worked_days_var.get())
+            check_working_days(total_days)
             kpi_score = self.bonus_kpi_var.get()
             overtime_hours = float(self.overtime_var.get())
             
-            # Очищаем таблицу результатов
-            for item in self.payroll_tree.get_children():
-                self.payroll_tree.delete(item)
-            
-            total_income_sum = 0
-            total_tax_sum = 0
-            total_net_sum = 0
-            
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
+            employee_ids = [self.employees_tree.item(item_id)['values'][0] for item_id in selection]
             
-            for item_id in selection:
-                item = self.employees_tree.item(item_id)
-                employee_id = item['values'][0]
-                
-                # Получаем данные сотрудника
-                cursor.execute("SELECT id, full_name, position, base_salary FROM employees WHERE id = ?", (employee_id,))
-                emp = cursor.fetchone()
-                
-                if emp:
-                    employee = Employee(
-                        id=emp[0],
-                        full_name=emp[1],
-                        position=emp[2],
-                        base_salary=emp[3]
-                    )
-                    
-                    # Расчеты
-                    base_salary = self.calculator.calculate_base_salary(
-                        employee, worked_days, total_days
-                    )
-                    
-                    bonus = self.calculator.calculate_bonus(employee, kpi_score)
-                    
-                    hourly_rate = employee.base_salary / 176
-                    overtime_pay = self.calculator.calculate_overtime(overtime_hours, hourly_rate)
-                    
-                    total_income = self.calculator.calculate_total_income(base_salary, bonus, overtime_pay)
-                    tax_amount = self.tax_service.calculate_ndfl(total_income)
-                    net_salary = self.tax_service.calculate_net_salary(total_income, tax_amount)
-                    
-                    # Добавляем в таблицу
-                    self.payroll_tree.insert('', 'end', values=(
-                        employee.full_name,
-                        f"{base_salary:,.2f} ₽",
-                        f"{bonus:,.2f} ₽",
-                        f"{overtime_pay:,.2f} ₽",
-                        f"{total_income:,.2f} ₽",
-                        f"{tax_amount:,.2f} ₽",
-                        f"{net_salary:,.2f} ₽"
-                    ))
-                    
-                    # Суммируем итоги
-                    total_income_sum += total_income
-                    total_tax_sum += tax_amount
-                    total_net_sum += net_salary
-            
-            conn.close()
+            def job():
+                with self.db.cursor() as cursor:
+                    return calculate_payroll_run(cursor, self.payroll_engine, month, worked_days,
+                                                 total_days, kpi_score, overtime_hours,
+                                                 employee_ids=employee_ids, cache=self.payroll_cache)
             
-            # Обновляем итоги
-            self.total_income_label.config(text=f"Общая сумма: {total_income_sum:,.2f} ₽")
-            self.total_tax_label.config(text=f"Общий НДФЛ: {total_tax_sum:,.2f} ₽")
-            self.total_net_label.config(text=f"К выплате: {total_net_sum:,.2f} ₽")
+            def done(data):
+                run_id, names, result, recalculated = data
+                self.payroll_export = (run_id, employee_ids)
+                self.show_payroll_results(names, result)
+                messagebox.showinfo("Успех", f"Расчет завершен для {len(names)} сотрудников\n"
+                                             f"Пересчитано: {recalculated}")
             
-            messagebox.showinfo("Успех", f"Расчет завершен для {len(selection)} сотрудников")
+            self.run_job('payroll', self.timed('payroll.calculate', job), done,
+                         "Не удалось выполнить расчет")
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось выполнить расчет:\n{e}")
     
-    def export_payroll_csv(self):
-        """Экспорт результатов расчета в CSV"""
-        try:
-            # Собираем данные из таблицы
-            data = []
-            for item in self.payroll_tree.get_children():
-                values = self.payroll_tree.item(item, 'values')
-                if values:
-                    data.append([v.replace(' ₽', '') for v in values])
-            
-            if not data:
-                messagebox.showwarning("Внимание", "Нет данных для экспорта")
+    def show_payroll_results(self, names, result):
+        """Вывод первой страницы результатов пакетного расчета и итогов"""
+        # Очищаем таблицу результатов
+        self.payroll_tree.delete(*self.payroll_tree.get_children())
+        self.payroll_results = (names, result)
+        
+        engine = self.payroll_engine
+        with self.metrics.timer('payroll.display'):
+            stop = min(self.PAYROLL_PAGE_SIZE, len(names))
+            self.insert_payroll_rows(0, stop, 'end')
+            self.payroll_window = (0, stop)
+        
+        # Обновляем итоги
+        total_income_sum, total_tax_sum, total_net_sum = engine.totals(result)
+        self.total_income_label.config(text=f"Общая сумма: {total_income_sum:,.2f} ₽")
+        self.total_tax_label.config(text=f"Общий НДФЛ: {total_tax_sum:,.2f} ₽")
+        self.total_net_label.config(text=f"К выплате: {total_net_sum:,.2f} ₽")
+    
+    def insert_payroll_rows(self, start, stop, index):
+        """Вставка строк результатов [start, stop) в таблицу (iid - номер строки)"""
+        names, result = self.payroll_results
+        engine = self.payroll_engine
+        page = {col: result[col][start:stop] for col in engine.COLUMNS}
+        with span('payroll.tree_insert', 'ui', rows=stop - start):
+            for row_no, name, amounts in zip(range(start, stop), names[start:stop], engine.iter_rows(page)):
+                self.payroll_tree.insert('', index, iid=row_no, values=(
+                    name, *(f"{engine.format_amount(amount)} ₽" for amount in amounts)
+                ))
+                if index != 'end':
+                    index += 1
+    
+    def on_payroll_scroll(self, first, last):
+        """Прокрутка результатов расчета: вывод страниц у краев окна"""
+        self.payroll_scrollbar.set(first, last)
+        if self.payroll_results is None:
+            return
+        start, stop = self.payroll_window
+        if float(last) > 0.9 and stop < len(self.payroll_results[0]):
+            self.root.after_idle(self.show_payroll_page, True)
+        elif float(first) < 0.1 and start > 0:
+            self.root.after_idle(self.show_payroll_page, False)
+    
+    def show_payroll_page(self, forward):
+        """Добавление страницы результатов в окно таблицы с удалением строк с другого края"""
+        tree = self.payroll_tree
+        start, stop = self.payroll_window
+        
+        if forward:
+            page_stop = min(stop + self.PAYROLL_PAGE_SIZE, len(self.payroll_results[0]))
+            if page_stop == stop:
                 return
-            
-            # Запрашиваем путь для сохранения
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")],
-                initialfile=f"payroll_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            )
-            
-            if not filename:
+            self.insert_payroll_rows(stop, page_stop, 'end')
+            stop = page_stop
+        else:
+            page_start = max(0, start - self.PAYROLL_PAGE_SIZE)
+            if page_start == start:
                 return
-            
-            # Сохраняем в CSV
-            with open(filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file, delimiter=';')
-                # Заголовки
-                writer.writerow(['ФИО', 'Оклад', 'Премия', 'Сверхурочные', 
-                               'Начислено', 'НДФЛ', 'К выплате'])
-                # Данные
-                for row in data:
-                    writer.writerow(row)
-            
-            messagebox.showinfo("Успех", f"Данные успешно экспортированы в:\n{filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось экспортировать данные:\n{e}")
+            self.insert_payroll_rows(page_start, start, 0)
+            # Сохраняем видимые строки на месте после вставки сверху
+            tree.yview_scroll(start - page_start, 'units')
+            start = page_start
+        
+        children = tree.get_children()
+        excess = len(children) - self.PAYROLL_WINDOW_SIZE
+        if excess > 0:
+            if forward:
+                tree.delete(*children[:excess])
+                tree.yview_scroll(-excess, 'units')
+                start += excess
+            else:
+                tree.delete(*children[-excess:])
+                stop -= excess
+        self.payroll_window = (start, stop)
+    
+    def export_payroll_csv(self):
+        """Экспорт последнего расчета в CSV из сохраненных строк расчета.
+        
+        Строки читаются из базы частями, суммы пишутся числами без
+        форматирования, вместе с id и ИНН сотрудника.
+        """
+        if self.payroll_export is None:
+            messagebox.showwarning("Внимание", "Нет данных для экспорта")
+            return
+        run_id, employee_ids = self.payroll_export
+        
+        # Запрашиваем путь для сохранения
+        from tkinter import filedialog
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")],
+            initialfile=f"payroll_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        
+        if not filename:
+            return
+        
+        def job():
+            with self.db.cursor() as cursor, \
+                    open(filename, 'w', newline='', encoding='utf-8') as file:
+                return write_payroll_csv(file, iter_payroll_run_lines(cursor, run_id, employee_ids))
+        
+        def done(count):
+            messagebox.showinfo("Успех", f"Экспортировано строк: {count}\nФайл:\n{filename}")
+        
+        self.run_job('payroll', self.timed('payroll.export', job), done,
+                     "Не удалось экспортировать данные")
     
     # ============================================================================
     # ОТЧЕТЫ
     # ============================================================================
     
     def generate_report(self, report_type):
-        """Генерация отчета"""
-        try:
-            conn = self.get_connection()
-            if not conn:
-                return
-            
-            cursor = conn.cursor()
-            report_content = ""
-            
-            if report_type == "payroll_report":
-                # Расчетная ведомость
-                cursor.execute("""
-                    SELECT e.full_name, e.position, e.department, e.base_salary, 
-                           e.bank_account, e.tax_id
-                    FROM employees e 
-                    WHERE e.is_active = 1
-                    ORDER BY e.department, e.full_name
-                """)
-                
-                employees = cursor.fetchall()
-                
-                report_content = "РАСЧЕТНАЯ ВЕДОМОСТЬ\n"
-                report_content += "=" * 50 + "\n"
-                report_content += f"Дата формирования: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n"
-                report_content += f"Всего сотрудников: {len(employees)}\n"
-                report_content += "=" * 50 + "\n\n"
-                
-                total_salary = 0
-                for emp in employees:
-                    report_content += f"ФИО: {emp[0]}\n"
-                    report_content += f"Должность: {emp[1]}\n"
-                    report_content += f"Отдел: {emp[2]}\n"
-                    report_content += f"Оклад: {emp[3]:,.2f} ₽\n"
-                    report_content += f"Банковский счет: {emp[4]}\n"
-                    report_content += f"ИНН: {emp[5]}\n"
-                    report_content += "-" * 30 + "\n"
-                    total_salary += emp[3]
-                
-                report_content += f"\nОБЩИЙ ФОНД ОПЛАТЫ: {total_salary:,.2f} ₽\n"
-                
-            elif report_type == "employee_list":
-                # Список сотрудников
-                cursor.execute("""
-                    SELECT e.full_name, e.position, e.department, e.base_salary, 
-                           e.hire_date, e.email, e.phone
-                    FROM employees e 
-                    WHERE e.is_active = 1
-                    ORDER BY e.department, e.full_name
-                """)
-                
-                employees = cursor.fetchall()
-                
-                report_content = "СПИСОК СОТРУДНИКОВ\n"
-                report_content += "=" * 50 + "\n"
-                report_content += f"Дата формирования: {datetime.now().strftime('%d.%m.%Y')}\n"
-                report_content += f"Всего сотрудников: {len(employees)}\n"
-                report_content += "=" * 50 + "\n\n"
-                
-                report_content += f"{'ФИО':<30} {'Должность':<20} {'Отдел':<15} {'Оклад':>10} {'Дата приема':<12}\n"
-                report_content += "-" * 87 + "\n"
-                
-                for emp in employees:
-                    report_content += f"{emp[0]:<30} {emp[1]:<20} {emp[2]:<15} {emp[3]:>10,.0f} ₽ {emp[4]:<12}\n"
-            
-            elif report_type == "tax_report":
-                # Налоговый отчет
-                cursor.execute("""
-                    SELECT e.full_name, e.tax_id, e.base_salary, 
-                           e.base_salary * 0.13 as ndfl
-                    FROM employees e 
-                    WHERE e.is_active = 1
-                    ORDER BY e.full_name
-                """)
-                
-                employees = cursor.fetchall()
-                
-                report_content = "НАЛОГОВЫЙ ОТЧЕТ (НДФЛ)\n"
-                report_content += "=" * 50 + "\n"
-                report_content += f"Период: {datetime.now().strftime('%m.%Y')}\n"
-                report_content += f"Ставка НДФЛ: 13%\n"
-                report_content += "=" * 50 + "\n\n"
+        """Генерация отчета во временный файл с постраничным предпросмотром.
+        
+        Если данные сотрудников и дата в заголовке не менялись с прошлого
+        формирования, отчет берется из кэша. Иначе первая страница показывается, как только она
+        сформирована, остальные строки подгружаются при прокрутке
+        (см. on_report_scroll).
+        """
+        request = object()  # отличает этот запуск от следующих
+        
+        def job():
+            started = time.perf_counter()
+            with span('report.generate', 'report', report=report_type) as report_span, \
+                    self.db.cursor() as cursor:
+                version = fetch_data_version(cursor)
+                now = datetime.now()
+                spool = self.report_cache.get(report_type, version, now)
+                report_span.set(cached=spool is not None)
+                if spool is not None:
+                    return spool, time.perf_counter() - started
                 
-                report_content += f"{'ФИО':<30} {'ИНН':<15} {'Доход':>12} {'НДФЛ':>12}\n"
-                report_content += "-" * 69 + "\n"
-                
-                total_income = 0
-                total_tax = 0
-                
-                for emp in employees:
-                    report_content += f"{emp[0]:<30} {emp[1]:<15} {emp[2]:>12,.2f} ₽ {emp[3]:>12,.2f} ₽\n"
-                    total_income += emp[2]
-                    total_tax += emp[3]
-                
-                report_content += "-" * 69 + "\n"
-                report_content += f"{'ИТОГО:':<45} {total_income:>12,.2f} ₽ {total_tax:>12,.2f} ₽\n"
-            
-            elif report_type == "department_report":
-                # Отчет по отделам
-                cursor.execute("""
-                    SELECT department, 
-                           COUNT(*) as emp_count,
-                           SUM(base_salary) as total_salary,
-                           AVG(base_salary) as avg_salary
-                    FROM employees 
-                    WHERE is_active = 1
-                    GROUP BY department
-                    ORDER BY department
-                """)
-                
-                departments = cursor.fetchall()
-                
-                report_content = "ОТЧЕТ ПО ОТДЕЛАМ\n"
-                report_content += "=" * 50 + "\n"
-                report_content += f"Дата формирования: {datetime.now().strftime('%d.%m.%Y')}\n"
-                report_content += "=" * 50 + "\n\n"
-                
-                report_content += f"{'Отдел':<20} {'Сотр.':>6} {'ФОТ':>12} {'Средняя':>12}\n"
-                report_content += "-" * 50 + "\n"
-                
-                total_employees = 0
-                total_salary = 0
-                
-                for dept in departments:
-                    report_content += f"{dept[0]:<20} {dept[1]:>6} {dept[2]:>12,.0f} ₽ {dept[3]:>12,.0f} ₽\n"
-                    total_employees += dept[1]
-                    total_salary += dept[2]
-                
-                report_content += "-" * 50 + "\n"
-                report_content += f"{'ИТОГО:':<20} {total_employees:>6} {total_salary:>12,.0f} ₽\n"
-            
-            conn.close()
-            
-            # Отображаем отчет в текстовом поле
-            self.report_text.delete(1.0, tk.END)
-            self.report_text.insert(1.0, report_content)
+                spool = ReportSpool()
+                try:
+                    spool.write(iter_report_lines(cursor, report_type, now),
+                                on_progress=lambda s: self.worker.post(self.show_report_progress, request, s),
+                                progress_lines=self.REPORT_PAGE_SIZE)
+                except Exception:
+                    spool.close()
+                    raise
+            
+            for evicted in self.report_cache.put(report_type, version, now, spool):
+                self.worker.post(self.release_report_spool, evicted)
+            return spool, None
+        
+        def done(result):
+            spool, cache_time = result
+            if request is not self.report_request:
+                # Предпросмотр очищен до завершения формирования
+                self.release_report_spool(spool)
+                return
             
-        except Exception as e:
+            self.show_report_progress(request, spool)
+            if cache_time is not None:
+                self.report_info_label.config(
+                    text=f"Строк: {spool.line_count:,}, из кэша за {cache_time * 1000:.0f} мс "
+                         f"(сформирован за {spool.elapsed:.2f} с)")
+        
+        def failed(e):
+            if request is self.report_request:
+                self.clear_report()
             messagebox.showerror("Ошибка", f"Не удалось сгенерировать отчет:\n{e}")
+        
+        if not self.worker.submit('reports', self.timed('report.generate', job), done, failed):
+            return
+        
+        self.clear_report()
+        self.report_request = request
+        self.report_type = report_type
+        self.report_info_label.config(text="Формирование отчета...")
     
-    def save_report_csv(self):
-        """Сохранение отчета как CSV"""
-        try:
-            report_content = self.report_text.get(1.0, tk.END).strip()
-            if not report_content:
-                messagebox.showwarning("Внимание", "Нет данных для сохранения")
+    def show_report_progress(self, request, spool):
+        """Первая страница отчета и число строк по ходу формирования"""
+        if request is not self.report_request:
+            return
+        self.report_spool = spool
+        
+        if self.report_window == (0, 0):
+            self.load_report_page(forward=True)
+        
+        if spool.finished:
+            self.report_info_label.config(
+                text=f"Строк: {spool.line_count:,}, сформирован за {spool.elapsed:.2f} с")
+        else:
+            self.report_info_label.config(text=f"Формирование отчета... строк: {spool.line_count:,}")
+    
+    def release_report_spool(self, spool):
+        """Удаление временного файла отчета, если он не в кэше и не в предпросмотре"""
+        if spool is self.report_spool or spool in self.report_cache:
+            return
+        spool.close()
+    
+    def on_report_scroll(self, first, last):
+        """Подгрузка строк отчета при прокрутке к краю предпросмотра"""
+        self.report_text.vbar.set(first, last)
+        if self.report_spool is None:
+            return
+        start, stop = self.report_window
+        if float(last) > 0.9 and stop < self.report_spool.line_count:
+            self.root.after_idle(self.load_report_page, True)
+        elif float(first) < 0.1 and start > 0:
+            self.root.after_idle(self.load_report_page, False)
+    
+    def load_report_page(self, forward):
+        """Следующая или предыдущая страница отчета; лишние строки с другого края удаляются"""
+        spool = self.report_spool
+        if spool is None:
+            return
+        start, stop = self.report_window
+        
+        if forward:
+            text = spool.read_lines(stop, stop + self.REPORT_PAGE_SIZE)
+            if not text:
                 return
-            
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")],
-                initialfile=f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            )
-            
-            if not filename:
+            self.report_text.insert(f'{stop - start + 1}.0', text)
+            stop = min(stop + self.REPORT_PAGE_SIZE, spool.line_count)
+            excess = stop - start - self.REPORT_WINDOW_SIZE
+            if excess > 0:
+                self.report_text.delete('1.0', f'{excess + 1}.0')
+                start += excess
+        else:
+            page_start = max(0, start - self.REPORT_PAGE_SIZE)
+            text = spool.read_lines(page_start, start)
+            if not text:
                 return
-            
-            # Сохраняем как CSV
-            with open(filename, 'w', newline='', encoding='utf-8') as file:
-                # Преобразуем текстовый отчет в CSV
-                lines = report_content.split('\n')
-                for line in lines:
-                    if line.strip():
-                        # Заменяем множественные пробелы на разделитель
-                        cells = [cell.strip() for cell in line.split('  ') if cell.strip()]
-                        file.write(';'.join(cells) + '\n')
-            
-            messagebox.showinfo("Успех", f"Отчет сохранен в:\n{filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить отчет:\n{e}")
+            self.report_text.insert('1.0', text)
+            start = page_start
+            excess = stop - start - self.REPORT_WINDOW_SIZE
+            if excess > 0:
+                self.report_text.delete(f'{self.REPORT_WINDOW_SIZE + 1}.0', tk.END)
+                stop -= excess
+        
+        self.report_window = (start, stop)
+    
+    def clear_report(self):
+        """Очистка предпросмотра отчета"""
+        spool = self.report_spool
+        self.report_spool = None
+        self.report_request = None
+        self.report_type = None
+        if spool is not None and spool.finished:
+            self.release_report_spool(spool)
+        self.report_window = (0, 0)
+        self.report_text.delete(1.0, tk.END)
+        self.report_info_label.config(text="")
+    
+    def save_report_csv(self):
+        """Сохранение отчета как CSV"""
+        self.save_report('csv', "CSV файлы")
     
     def save_report_txt(self):
         """Сохранение отчета как TXT"""
-        try:
-            report_content = self.report_text.get(1.0, tk.END).strip()
-            if not report_content:
-                messagebox.showwarning("Внимание", "Нет данных для сохранения")
-                return
-            
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".txt",
-                filetypes=[("Текстовые файлы", "*.txt"), ("Все файлы", "*.*")],
-                initialfile=f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            )
-            
-            if not filename:
-                return
-            
-            # Сохраняем как TXT
-            with open(filename, 'w', encoding='utf-8') as file:
-                file.write(report_content)
-            
+        self.save_report('txt', "Текстовые файлы")
+    
+    def save_report(self, file_format, file_type_name):
+        """Сохранение отчета целиком (а не только предпросмотра).
+        
+        TXT - сформированный текст отчета, CSV - данные отчета по его модели
+        столбцов, выгружаемые напрямую из базы.
+        """
+        spool = self.report_spool
+        report_type = self.report_type
+        if spool is None:
+            messagebox.showwarning("Внимание", "Нет данных для сохранения")
+            return
+        if not spool.finished:
+            messagebox.showwarning("Внимание", "Дождитесь завершения формирования отчета")
+            return
+        
+        from tkinter import filedialog
+        filename = filedialog.asksaveasfilename(
+            defaultextension=f".{file_format}",
+            filetypes=[(file_type_name, f"*.{file_format}"), ("Все файлы", "*.*")],
+            initialfile=f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+        )
+        
+        if not filename:
+            return
+        
+        def job():
+            with open(filename, 'w', newline='', encoding='utf-8') as file:
+                if file_format == 'csv':
+                    with self.db.cursor() as cursor:
+                        write_report_csv(cursor, report_type, file)
+                else:
+                    write_report(spool.iter_lines(), file)
+        
+        def done(_):
             messagebox.showinfo("Успех", f"Отчет сохранен в:\n{filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить отчет:\n{e}")
+        
+        self.run_job('reports', self.timed('report.save', job), done, "Не удалось сохранить отчет")
     
     # ============================================================================
     # ИМПОРТ ИЗ 1С
@@ -1228,6 +1462,7 @@ class SalarySystemApp:
             ("Все файлы", "*.*")
         ]
         
+        from tkinter import filedialog
         filename = filedialog.askopenfilename(
             title="Выберите файл для импорта",
             filetypes=filetypes
@@ -1244,21 +1479,19 @@ class SalarySystemApp:
             
             if filename.endswith('.csv'):
                 with open(filename, 'r', encoding='utf-8') as file:
-                    content = file.read()
                     # Показываем первые 1000 символов
-                    preview = content[:1000]
-                    self.import_text.insert(1.0, preview)
+                    content = file.read(1001)
+                    self.import_text.insert(1.0, content[:1000])
                     if len(content) > 1000:
                         self.import_text.insert(tk.END, "\n... (файл слишком большой для предпросмотра)")
             
             elif filename.endswith('.json'):
-                with open(filename, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    preview = json.dumps(data, ensure_ascii=False, indent=2)
-                    # Показываем первые 1000 символов
-                    self.import_text.insert(1.0, preview[:1000])
-                    if len(preview) > 1000:
-                        self.import_text.insert(tk.END, "\n... (файл слишком большой для предпросмотра)")
+                # Разбираем только первых сотрудников, а не весь файл
+                employees, has_more = preview_json_employees(filename)
+                preview = json.dumps({'employees': employees}, ensure_ascii=False, indent=2)
+                self.import_text.insert(1.0, preview)
+                if has_more:
+                    self.import_text.insert(tk.END, "\n... (показаны первые сотрудники файла)")
             
             else:
                 self.import_text.insert(1.0, "Неподдерживаемый формат файла")
@@ -1272,8 +1505,17 @@ class SalarySystemApp:
         if not filename or not os.path.exists(filename):
             messagebox.showwarning("Внимание", "Выберите файл для импорта")
             return
+        if not self.check_database_ready():
+            return
         
-        try:
+        if filename.endswith(('.csv', '.json')) and self.stream_import_var.get():
+            self.import_streaming(filename)
+            return
+        
+        update_existing = self.update_existing_var.get()
+        create_missing = self.create_missing_var.get()
+        
+        def job():
             imported_data = []
             
             if filename.endswith('.csv'):
@@ -1281,105 +1523,33 @@ class SalarySystemApp:
                 with open(filename, 'r', encoding='utf-8') as file:
                     reader = csv.DictReader(file, delimiter=';')
                     for row in reader:
-                        # Маппинг полей (адаптируйте под вашу структуру 1С)
-                        imported_data.append({
-                            'full_name': row.get('ФИО', ''),
-                            'position': row.get('Должность', ''),
-                            'base_salary': float(row.get('Оклад', 0)),
-                            'department': row.get('Отдел', ''),
-                            'tax_id': row.get('ИНН', ''),
-                            'bank_account': row.get('БанковскийСчет', '')
-                        })
+                        imported_data.append(map_csv_row(row))
             
             elif filename.endswith('.json'):
                 # Импорт из JSON
-                with open(filename, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    # Предполагаем, что данные в формате списка сотрудников
-                    for item in data.get('employees', []):
-                        imported_data.append({
-                            'full_name': item.get('full_name', ''),
-                            'position': item.get('position', ''),
-                            'base_salary': float(item.get('base_salary', 0)),
-                            'department': item.get('department', ''),
-                            'tax_id': item.get('tax_id', ''),
-                            'bank_account': item.get('bank_account', '')
-                        })
+                # Предполагаем, что данные в формате списка сотрудников
+                for item in iter_json_employees(filename):
+                    imported_data.append(map_json_item(item))
             
             if not imported_data:
-                messagebox.showwarning("Внимание", "В файле нет данных для импорта")
-                return
+                return None
             
             # Импортируем данные в базу
-            conn = self.get_connection()
-            if not conn:
+            with span('import.upsert', 'import', rows=len(imported_data)), \
+                    self.db.cursor() as cursor:
+                return bulk_upsert_employees(
+                    cursor, imported_data,
+                    update_existing=update_existing,
+                    create_missing=create_missing
+                )
+        
+        def done(counts):
+            if counts is None:
+                messagebox.showwarning("Внимание", "В файле нет данных для импорта")
                 return
             
-            cursor = conn.cursor()
-            
-            # Создаем таблицу если она не существует
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='employees'")
-            if not cursor.fetchone():
-                cursor.execute('''
-                    CREATE TABLE employees (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        full_name TEXT NOT NULL,
-                        position TEXT NOT NULL,
-                        base_salary REAL NOT NULL,
-                        department TEXT,
-                        bank_account TEXT,
-                        tax_id TEXT,
-                        email TEXT,
-                        phone TEXT,
-                        hire_date TEXT,
-                        is_active BOOLEAN DEFAULT TRUE,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            
-            imported_count = 0
-            updated_count = 0
-            
-            for emp_data in imported_data:
-                # Проверяем, существует ли сотрудник
-                cursor.execute("SELECT id FROM employees WHERE full_name = ?", (emp_data['full_name'],))
-                existing = cursor.fetchone()
-                
-                if existing and self.update_existing_var.get():
-                    # Обновляем существующего
-                    cursor.execute('''
-                        UPDATE employees 
-                        SET position = ?, base_salary = ?, department = ?, 
-                            bank_account = ?, tax_id = ?
-                        WHERE id = ?
-                    ''', (
-                        emp_data['position'],
-                        emp_data['base_salary'],
-                        emp_data['department'],
-                        emp_data['bank_account'],
-                        emp_data['tax_id'],
-                        existing[0]
-                    ))
-                    updated_count += 1
-                elif self.create_missing_var.get():
-                    # Добавляем нового
-                    cursor.execute('''
-                        INSERT INTO employees (full_name, position, base_salary, department, 
-                                              bank_account, tax_id, hire_date)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        emp_data['full_name'],
-                        emp_data['position'],
-                        emp_data['base_salary'],
-                        emp_data['department'],
-                        emp_data['bank_account'],
-                        emp_data['tax_id'],
-                        datetime.now().strftime('%Y-%m-%d')
-                    ))
-                    imported_count += 1
-            
-            conn.commit()
-            conn.close()
+            imported_count, updated_count, skipped_count = counts
+            self.payroll_cache.clear()
             
             # Обновляем список сотрудников
             self.load_employees()
@@ -1387,10 +1557,202 @@ class SalarySystemApp:
             messagebox.showinfo("Успех", 
                               f"Импорт завершен:\n"
                               f"Импортировано новых: {imported_count}\n"
-                              f"Обновлено существующих: {updated_count}")
+                              f"Обновлено существующих: {updated_count}\n"
+                              f"Пропущено (несколько сотрудников с таким ФИО): {skipped_count}")
+        
+        self.run_job('import', self.timed('import', job), done, "Не удалось импортировать данные")
+    
+    def import_streaming(self, filename):
+        """Потоковый импорт CSV/JSON частями с отображением хода и отменой"""
+        cancel_event = threading.Event()
+        update_existing = self.update_existing_var.get()
+        create_missing = self.create_missing_var.get()
+        
+        def job():
+            return stream_import(
+                self.db, filename,
+                update_existing=update_existing,
+                create_missing=create_missing,
+                on_progress=lambda progress: self.worker.post(self.show_import_progress, progress),
+                cancel_event=cancel_event
+            )
+        
+        def done(progress):
+            self.finish_import()
             
-        except Exception as e:
+            # Обновляем список сотрудников
+            self.load_employees()
+            
+            title = "Импорт отменен" if progress.cancelled else "Импорт завершен"
+            messagebox.showinfo("Успех", 
+                              f"{title}:\n"
+                              f"Обработано строк: {progress.rows}\n"
+                              f"Импортировано новых: {progress.imported_count}\n"
+                              f"Обновлено существующих: {progress.updated_count}\n"
+                              f"Пропущено (несколько сотрудников с таким ФИО): {progress.skipped_count}")
+        
+        def failed(e):
+            self.finish_import()
             messagebox.showerror("Ошибка", f"Не удалось импортировать данные:\n{e}")
+        
+        if not self.worker.submit('import', self.timed('import', job), done, failed):
+            return
+        
+        self.import_cancel_event = cancel_event
+        self.import_button.config(state='disabled')
+        self.cancel_import_button.config(state='normal')
+        self.import_progress['value'] = 0
+    
+    def finish_import(self):
+        """Возврат кнопок импорта в исходное состояние"""
+        # Импорт мог изменить любых сотрудников, в том числе при ошибке
+        self.payroll_cache.clear()
+        self.import_cancel_event = None
+        self.import_button.config(state='normal')
+        self.cancel_import_button.config(state='disabled')
+    
+    def show_import_progress(self, progress):
+        """Отображение хода потокового импорта"""
+        self.import_progress['value'] = progress.percent
+        self.import_progress_label.config(
+            text=f"Обработано строк: {progress.rows:,} ({progress.percent:.1f}%), "
+                 f"скорость: {progress.rows_per_second:,.0f} строк/с"
+        )
+    
+    def cancel_import(self):
+        """Отмена потокового импорта после текущей части"""
+        if getattr(self, 'import_cancel_event', None):
+            self.import_cancel_event.set()
+    
+    # ============================================================================
+    # ДИАГНОСТИКА
+    # ============================================================================
+    
+    def refresh_diagnostics(self):
+        """Обновление вкладки Диагностика.
+        
+        Метрики и кэши читаются сразу, сведения о базе - в фоне. Пока
+        вкладка открыта, обновление повторяется каждые DIAGNOSTICS_REFRESH мс.
+        """
+        if self.diagnostics_after_id is not None:
+            self.root.after_cancel(self.diagnostics_after_id)
+            self.diagnostics_after_id = None
+        
+        self.show_operation_metrics()
+        self.show_cache_stats()
+        self.show_slowest_sql()
+        
+        def job():
+            # Курсор без замеров: запросы диагностики не попадают в список медленных
+            with self.db.connection() as conn:
+                return fetch_database_info(conn.cursor())
+        
+        self.worker.submit('diagnostics', job, self.show_database_info)
+        
+        if self.is_tab_selected('diagnostics'):
+            self.diagnostics_after_id = self.root.after(self.DIAGNOSTICS_REFRESH, self.refresh_diagnostics)
+    
+    def reset_diagnostics(self):
+        """Сброс накопленных замеров операций и запросов"""
+        self.metrics.reset()
+        self.refresh_diagnostics()
+    
+    def show_operation_metrics(self):
+        """Процентили длительности операций в таблице"""
+        titles = dict(self.DIAGNOSTIC_OPERATIONS)
+        snapshot = self.metrics.snapshot()
+        for key in snapshot:
+            if not self.operations_tree.exists(key):
+                self.operations_tree.insert('', 'end', iid=key)
+        
+        for key in self.operations_tree.get_children():
+            stats = snapshot.get(key)
+            if stats is None:
+                # Операция без замеров (еще не запускалась или замеры сброшены)
+                self.operations_tree.item(key, values=(titles.get(key, key), 0, 0, '', '', '', ''))
+                continue
+            self.operations_tree.item(key, values=(
+                titles.get(key, key), stats['count'], stats['errors'],
+                *(f"{stats[name] * 1000:,.1f}" for name in ('p50', 'p95', 'max', 'last'))
+            ))
+        
+        self.show_latency_histogram(snapshot)
+    
+    def show_latency_histogram(self, snapshot=None):
+        """Гистограмма длительностей выбранной (или первой) операции"""
+        if snapshot is None:
+            snapshot = self.metrics.snapshot()
+        selection = self.operations_tree.selection()
+        key = selection[0] if selection else self.DIAGNOSTIC_OPERATIONS[0][0]
+        stats = snapshot.get(key)
+        
+        self.histogram_text.delete('1.0', tk.END)
+        self.histogram_text.insert(tk.END, f"{dict(self.DIAGNOSTIC_OPERATIONS).get(key, key)}\n\n")
+        if stats is None:
+            self.histogram_text.insert(tk.END, "Нет замеров")
+            return
+        
+        labels = [f"<= {bound * 1000:g} мс" if bound < 1 else f"<= {bound:g} с" for bound in LATENCY_BUCKETS]
+        labels.append(f"> {LATENCY_BUCKETS[-1]:g} с")
+        largest = max(stats['buckets']) or 1
+        for label, count in zip(labels, stats['buckets']):
+            bar = '#' * round(count / largest * 20)
+            self.histogram_text.insert(tk.END, f"{label:>11} {bar:<20} {count}\n")
+        self.histogram_text.insert(tk.END, f"\nСреднее: {stats['mean'] * 1000:,.1f} мс")
+    
+    def show_cache_stats(self):
+        """Попадания в кэши расчетов и отчетов"""
+        payroll = self.payroll_cache.stats()
+        reports = self.report_cache.stats()
+        report_requests = reports['hits'] + reports['misses']
+        report_hit_rate = reports['hits'] / report_requests if report_requests else 0.0
+        self.cache_info_label.config(text=(
+            f"Расчеты: попаданий {payroll['hits']:,}, промахов {payroll['misses']:,} "
+            f"({payroll['hit_rate']:.0%}), записей {payroll['size']:,} из {payroll['maxsize']:,}\n"
+            f"Отчеты: попаданий {reports['hits']:,}, промахов {reports['misses']:,} "
+            f"({report_hit_rate:.0%}), отчетов {reports['size']} из {reports['maxsize']}\n"
+            f"Время формирования отчетов: {reports['generation_time']:.2f} с"
+        ))
+    
+    def show_slowest_sql(self):
+        """Самые медленные из последних запросов (время выполнения и выборки)"""
+        self.slow_sql_tree.delete(*self.slow_sql_tree.get_children())
+        for statement in self.metrics.slowest_sql(self.SLOW_SQL_LIMIT):
+            self.slow_sql_tree.insert('', 'end', values=(
+                f"{statement.duration * 1000:,.1f}", statement.rows,
+                time.strftime('%H:%M:%S', time.localtime(statement.finished_at)),
+                ' '.join(statement.sql.split())
+            ))
+    
+    def show_database_info(self, info):
+        """Размер базы, страницы, кэш страниц SQLite и число строк"""
+        cache_kb = (-info['cache_size'] if info['cache_size'] < 0
+                    else info['cache_size'] * info['page_size'] // 1024)
+        rows = ', '.join(f"{table} {count:,}" for table, count in info['rows'].items())
+        self.db_info_label.config(text=(
+            f"Файл: {info['path']}\n"
+            f"Размер: {info['file_size'] / 2**20:,.1f} МБ, журнал WAL: {info['wal_size'] / 2**20:,.1f} МБ "
+            f"({info['journal_mode']})\n"
+            f"Страниц: {info['page_count']:,} по {info['page_size']} Б, свободных: {info['freelist_count']:,}\n"
+            f"Кэш страниц SQLite: {cache_kb:,} КБ на соединение\n"
+            f"Строк: {rows or 'нет таблиц'}"
+        ))
+    
+    def close(self):
+        """Закрытие окна: остановка фоновых заданий и соединений с базой"""
+        if getattr(self, 'import_cancel_event', None):
+            self.import_cancel_event.set()
+        if self.diagnostics_after_id is not None:
+            self.root.after_cancel(self.diagnostics_after_id)
+        self.worker.shutdown()
+        if self.payroll_engine is not None:
+            self.payroll_engine.shutdown()
+        for spool in self.report_cache.clear():
+            spool.close()
+        if self.report_spool is not None:
+            self.report_spool.close()
+        self.db.close_all()
+        self.root.destroy()
 
 # ============================================================================
 # ЗАПУСК ПРИЛОЖЕНИЯ
@@ -1410,6 +1772,7 @@ def main():
         
         # Создаем и запускаем приложение
         app = SalarySystemApp(root)
+        root.protocol("WM_DELETE_WINDOW", app.close)
         
         # Центрируем окно
         root.update_idletasks()
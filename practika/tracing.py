@@ -0,0 +1,249 @@
+# tracing.py
+# Трассировка времени выполнения: вложенные интервалы (операция, SQL,
+# число строк, длительность) в формате Chrome trace-event JSON, который
+# открывается в chrome://tracing или https://ui.perfetto.dev.
+#
+# Включается переменной окружения SALARY_TRACE с путем к файлу трассы:
+#   SALARY_TRACE=trace.json python salary_system.py
+# Без нее span() возвращает общий пустой интервал. Модуль не зависит
+# от tkinter.
+import atexit
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = 'SALARY_TRACE'
+SQL_TEXT_LIMIT = 500  # символов текста запроса в аргументах интервала
+
+class _NullSpan:
+    """Интервал при выключенной трассировке: ничего не записывает"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def set(self, **args):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    """Интервал трассы; записывается при выходе из блока with"""
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+    
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+    
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.category, self.start, duration, self.args)
+        return False
+    
+    def set(self, **args):
+        """Добавить аргументы (например, число строк) к интервалу"""
+        self.args.update(args)
+
+class Tracer:
+    """Запись интервалов в файл трассы.
+    
+    События пишутся сразу, по одному на строку, в формате JSON-массива:
+    трасса читается, даже если приложение завершилось аварийно и
+    закрывающая скобка не записана. Вложенность интервалов определяется
+    просмотрщиком по времени внутри потока.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._threads = set()
+        # Построчная буферизация: каждое событие сразу попадает в файл
+        self._file = open(path, 'w', encoding='utf-8', buffering=1)
+        self._file.write('[\n')
+        self._write({'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'tid': 0,
+                     'args': {'name': 'salary_system'}})
+    
+    def record(self, name, category, start, duration, args):
+        tid = threading.get_ident()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': tid,
+                 'ts': (start - self._origin) / 1000, 'dur': duration / 1000}
+        if args:
+            event['args'] = args
+        
+        with self._lock:
+            if self._file is None:
+                return
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self._write({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                             'args': {'name': threading.current_thread().name}})
+            self._write(event)
+    
+    def _write(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False, default=str) + ',\n')
+    
+    def close(self):
+        """Дописать конец массива и закрыть файл"""
+        with self._lock:
+            if self._file is None:
+                return
+            # Последнее событие без запятой, чтобы файл был корректным JSON
+            self._file.write(json.dumps({'name': 'trace_end', 'ph': 'i', 's': 'p',
+                                         'pid': self._pid, 'tid': 0,
+                                         'ts': (time.perf_counter_ns() - self._origin) / 1000}))
+            self._file.write('\n]\n')
+            self._file.close()
+            self._file = None
+
+_tracer = None
+
+def enable(path):
+    """Включить трассировку с записью в path (предыдущая трасса закрывается)"""
+    global _tracer
+    disable()
+    _tracer = Tracer(path)
+    return _tracer
+
+def disable():
+    """Выключить трассировку и закрыть файл"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+def tracing_enabled():
+    return _tracer is not None
+
+def span(name, category='app', **args):
+    """Интервал трассы для блока with: with span('payroll.run', rows=n) as s: ...
+    
+    При выключенной трассировке возвращается NULL_SPAN.
+    """
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, category, args)
+
+def _sql_args(sql):
+    text = ' '.join(sql.split())
+    if len(text) > SQL_TEXT_LIMIT:
+        text = text[:SQL_TEXT_LIMIT] + '...'
+    verb = text.split(' ', 1)[0].upper() if text else 'SQL'
+    return f"sql {verb}", text
+
+class SqlStatement:
+    """Выполненный запрос: текст, время выполнения и выборки (с), строк выбрано"""
+    __slots__ = ('sql', 'duration', 'rows', 'finished_at')
+    
+    def __init__(self, sql):
+        self.sql = sql
+        self.duration = 0.0
+        self.rows = 0
+        self.finished_at = 0.0  # time.time() последнего выполнения или выборки
+
+class TracedCursor:
+    """Курсор sqlite3 с замером выполнения запросов и выборки.
+    
+    При включенной трассировке execute/executemany записываются интервалами
+    с текстом запроса и rowcount, fetchall/fetchmany - с числом строк.
+    Если передан on_statement, он вызывается с SqlStatement каждого
+    запроса; время выборки строк этого запроса добавляется к нему позже.
+    Остальные атрибуты берутся у исходного курсора.
+    """
+    
+    def __init__(self, cursor, on_statement=None):
+        self._cursor = cursor
+        self._on_statement = on_statement
+        self._statement = None
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+    
+    def __iter__(self):
+        return iter(self._cursor)
+    
+    def _span(self, sql, **args):
+        if _tracer is None:
+            return NULL_SPAN
+        name, text = _sql_args(sql)
+        return Span(_tracer, name, 'db', dict(args, sql=text))
+    
+    def _begin(self, sql):
+        self._statement = SqlStatement(sql)
+        if self._on_statement is not None:
+            self._on_statement(self._statement)
+        return time.perf_counter()
+    
+    def _finish(self, started, rows=0):
+        statement = self._statement
+        if statement is not None:
+            statement.duration += time.perf_counter() - started
+            statement.rows += rows
+            statement.finished_at = time.time()
+    
+    def execute(self, sql, parameters=()):
+        with self._span(sql) as s:
+            started = self._begin(sql)
+            self._cursor.execute(sql, parameters)
+            self._finish(started)
+            s.set(rowcount=self._cursor.rowcount)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        with self._span(sql, many=True) as s:
+            started = self._begin(sql)
+            self._cursor.executemany(sql, seq_of_parameters)
+            self._finish(started)
+            s.set(rowcount=self._cursor.rowcount)
+        return self
+    
+    def executescript(self, sql_script):
+        with self._span(sql_script):
+            started = self._begin(sql_script)
+            self._cursor.executescript(sql_script)
+            self._finish(started)
+        return self
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._finish(started, row is not None)
+        return row
+    
+    def fetchall(self):
+        with span('sql fetch', 'db') as s:
+            started = time.perf_counter()
+            rows = self._cursor.fetchall()
+            self._finish(started, len(rows))
+            s.set(rows=len(rows))
+        return rows
+    
+    def fetchmany(self, size=None):
+        with span('sql fetch', 'db') as s:
+            started = time.perf_counter()
+            rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+            self._finish(started, len(rows))
+            s.set(rows=len(rows))
+        return rows
+
+if os.environ.get(TRACE_ENV):
+    # Процессы пула расчета (spawn) наследуют окружение, но трассу пишет
+    # только основной процесс. multiprocessing не импортируется без трассировки.
+    from multiprocessing import parent_process
+    if parent_process() is None:
+        enable(os.environ[TRACE_ENV])
+        atexit.register(disable)
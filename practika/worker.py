@@ -0,0 +1,89 @@
+# worker.py
+# Фоновое выполнение заданий БД и расчетов, чтобы главный цикл Tk
+# не блокировался. Результаты возвращаются в поток интерфейса через
+# root.after.
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span
+
+class BackgroundWorker:
+    """Пул потоков для заданий, результаты которых нужны интерфейсу.
+    
+    Каждое задание имеет ключ (обычно вкладка: 'employees', 'payroll', ...).
+    Пока задание с ключом выполняется, повторная отправка с тем же ключом
+    отклоняется. Обработчики результата и ошибки вызываются в потоке Tk:
+    рабочие потоки кладут их в очередь, которую опрашивает root.after.
+    """
+    POLL_INTERVAL = 50  # мс
+    
+    def __init__(self, root, max_workers=2, on_busy_change=None):
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='salary-worker')
+        self._callbacks = queue.Queue()
+        self._running = set()
+        self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+    
+    def is_busy(self, key):
+        return key in self._running
+    
+    def submit(self, key, func, on_success=None, on_error=None):
+        """Выполнить func() в фоне. False - если задание с ключом уже идет"""
+        if key in self._running:
+            return False
+        
+        self._running.add(key)
+        self._set_busy(key, True)
+        future = self._executor.submit(self._run, key, func)
+        future.add_done_callback(
+            lambda f: self._callbacks.put(lambda: self._finish(key, f, on_success, on_error))
+        )
+        return True
+    
+    def post(self, callback, *args):
+        """Вызвать callback(*args) в потоке Tk (можно из рабочего потока)"""
+        self._callbacks.put(lambda: callback(*args))
+    
+    def shutdown(self):
+        """Остановить опрос очереди и пул потоков"""
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _run(key, func):
+        with span(f"job {key}", 'worker'):
+            return func()
+    
+    def _finish(self, key, future, on_success, on_error):
+        self._running.discard(key)
+        self._set_busy(key, False)
+        
+        error = future.exception()
+        with span(f"done {key}", 'ui', failed=error is not None):
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+                else:
+                    print(f"Ошибка фонового задания {key}: {error}")
+            elif on_success is not None:
+                on_success(future.result())
+    
+    def _set_busy(self, key, busy):
+        if self.on_busy_change is not None:
+            self.on_busy_change(key, busy)
+    
+    def _poll(self):
+        while True:
+            try:
+                callback = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback()
+            except Exception as e:
+                print(f"Ошибка обработки результата фонового задания: {e}")
+        self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)